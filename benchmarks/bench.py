@@ -0,0 +1,171 @@
+"""
+Benchmarks of the parsing and query hot paths of smye on synthetic OUTCARs.
+
+Every benchmark is timed on a fresh Diagram, so the queries include the
+sorting of the states they trigger, and runs in a process of its own. The
+wall time of the best repetition, the throughput over the size of the file,
+the peak of the Python heap traced by tracemalloc and the peak resident
+memory of the process are reported. Only the latter counts the pages of the
+file mapped with mmap, it includes the interpreter and the setup of the
+benchmark too. Example:
+
+    python benchmarks/bench.py --steps 200 --bands 800 --kpoints 8
+"""
+
+import os
+import sys
+import time
+import resource
+import subprocess
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import smye
+import synthetic
+
+
+def measure(function, repeat):
+    """
+    Call function repeat times.
+
+    :returns: Tuple (best wall time in seconds, peak traced memory in bytes)
+
+    """
+    best = float("inf")
+    peak = 0
+    for i in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return best, peak
+
+
+def getBenchmarks(filePath, spin):
+    """
+    Get the benchmarks as a list of (name, function)
+    """
+    # parsed only by the benchmarks of the queries
+    configuration = []
+
+    def parsed():
+        if not configuration:
+            configuration.append(smye.Diagram(filePath, spin=spin).getConfiguration())
+        diagram = smye.Diagram(filePath, spin=spin)
+        diagram._setConfiguration(configuration[0])
+        return diagram
+
+    benchmarks = [
+        ("_parseFile", lambda: smye.Diagram(filePath, spin=spin)._parseFile()),
+        ("_parseFile (full read)",
+            lambda: smye.Diagram(filePath, spin=spin, reverse=False)._parseFile()),
+        ("getBandGap", lambda: parsed().getBandGap()),
+        ("getStatesAboutFermiLevel",
+            lambda: parsed().getStatesAboutFermiLevel(50, 50)),
+        ("showASCII", lambda: parsed().showASCII()),
+    ]
+    if spin:
+        benchmarks.append(("getNettoSpin", lambda: parsed().getNettoSpin()))
+    return benchmarks
+
+
+def getMaxRSS():
+    """
+    :returns: Peak resident memory of the process in bytes
+    """
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxrss if sys.platform == "darwin" else maxrss*1024
+
+
+def run(filePath, spin, name, repeat):
+    """
+    Run the benchmark called name in this process.
+
+    :returns: Tuple (best wall time in seconds, peak traced memory in bytes,
+              peak resident memory in bytes)
+
+    """
+    function = dict(getBenchmarks(filePath, spin))[name]
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            # not timed, the configuration of the queries is parsed here
+            function()
+            best, peak = measure(function, repeat)
+    return best, peak, getMaxRSS()
+
+
+def runProcess(filePath, spin, name, repeat):
+    """
+    Run the benchmark called name in a new process, so that its resident
+    memory is not mixed with the one of the other benchmarks.
+
+    :returns: The tuple of run
+
+    """
+    command = [
+        sys.executable, os.path.abspath(__file__), "--file", filePath,
+        "--run", name, "--repeat", str(repeat)
+    ]
+    if not spin:
+        command.append("--no-spin")
+    output = subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout
+    return tuple(float(value) for value in output.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20, help="Ionic steps")
+    parser.add_argument("--bands", type=int, default=384, help="Bands")
+    parser.add_argument("--kpoints", type=int, default=1, help="K-points")
+    parser.add_argument("--no-spin", action="store_true", help="Unpolarised")
+    parser.add_argument("--padding", type=int, default=1000,
+            help="Lines between the eigenvalue blocks")
+    parser.add_argument("--repeat", type=int, default=3,
+            help="Repetitions of every benchmark")
+    parser.add_argument("--file", default=None,
+            help="Benchmark this file instead of a synthetic one")
+    parser.add_argument("--run", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    spin = not args.no_spin
+
+    if args.run:
+        # child process of runProcess
+        print("%r %r %r"%run(args.file, spin, args.run, args.repeat))
+        return
+
+    if args.file:
+        filePath = args.file
+    else:
+        fd, filePath = tempfile.mkstemp(prefix="OUTCAR")
+        os.close(fd)
+        synthetic.writeOutcar(
+            filePath, steps=args.steps, bands=args.bands,
+            kpoints=args.kpoints, spin=spin, padding=args.padding
+        )
+    size = os.path.getsize(filePath)
+    print("file %s (%.1f MB)"%(filePath, size/2.0**20))
+    print("%-28s %12s %12s %12s %12s"%(
+        "benchmark", "time [s]", "MB/s", "heap [MB]", "rss [MB]"
+    ))
+    try:
+        for name, function in getBenchmarks(filePath, spin):
+            best, peak, maxrss = runProcess(filePath, spin, name, args.repeat)
+            print("%-28s %12.6f %12.1f %12.2f %12.2f"%(
+                name, best, size/2.0**20/best, peak/2.0**20, maxrss/2.0**20
+            ))
+    finally:
+        if not args.file:
+            os.remove(filePath)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark of the startup time of the smye CLI, every command is run as a new
+interpreter, as a workflow manager does, and the wall time of the best and
+the mean repetition are reported together with the modules that are loaded.
+Example:
+
+    python benchmarks/startup.py --repeat 20
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SMYE = os.path.join(ROOT, "bin", "smye")
+OUTCAR = os.path.join(ROOT, "OUTCAR")
+
+#: Commands to time as (name, arguments of the interpreter)
+COMMANDS = [
+    ("python", ["-c", "pass"]),
+    ("import smye", ["-c", "import smye"]),
+    ("smye --version", [SMYE, "--version"]),
+    ("smye --help", [SMYE, "--help"]),
+    ("smye -g", [SMYE, OUTCAR, "-g"]),
+]
+
+
+def measure(arguments, repeat):
+    """
+    Run the interpreter with arguments repeat times.
+
+    :returns: Tuple (best wall time, mean wall time) in seconds
+
+    """
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + arguments, env=environment,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times)/len(times)
+
+
+def loadsNumpy(arguments):
+    """
+    Check if running the interpreter with arguments imports numpy
+    """
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + arguments, env=environment,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    return re.search(rb"\|\s+numpy\n", result.stderr) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10,
+            help="Repetitions of every command")
+    args = parser.parse_args()
+    print("%-20s %12s %12s %8s"%("command", "best [ms]", "mean [ms]", "numpy"))
+    for name, arguments in COMMANDS:
+        best, mean = measure(arguments, args.repeat)
+        print("%-20s %12.1f %12.1f %8s"%(
+            name, 1e3*best, 1e3*mean, "yes" if loadsNumpy(arguments) else "no"
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Generation of synthetic files in the OUTCAR format of any size, with the same
+layout of the eigenvalue blocks as data/OUTCAR (spin polarised) and
+data/OUTCAR_NOSPIN (unpolarised).
+
+Example:
+
+    python benchmarks/synthetic.py --steps 100 --bands 800 --kpoints 4 OUTCAR
+"""
+
+import argparse
+
+import numpy as np
+
+SEPARATOR = "-"*104
+
+#: Line written between the eigenvalue blocks to simulate the rest of the
+#: output of an ionic step
+PADDING_LINE = "      POTLOK:  cpu time    0.1234: real time    0.1234\n"
+
+
+def writeHeader(f, bands, kpoints, spin):
+    f.write(
+        "   k-points           NKPTS =  %6d   k-points in BZ     NKDIM =  %6d"
+        "   number of bands    NBANDS= %6d\n"%(kpoints, kpoints, bands)
+    )
+    f.write("   ISPIN  =  %5d    spin polarized calculation?\n"%(2 if spin else 1))
+
+
+def writeBlock(f, energies, occupations, spin):
+    """
+    Write an eigenvalue block.
+
+    :energies: Array of shape (spin, kpoint, band)
+    :occupations: Array of shape (spin, kpoint, band)
+
+    """
+    f.write(" E-fermi :  %7.4f     XC(G=0): -13.3210     alpha+bet :-20.4673\n\n\n"
+            %energies.mean())
+    numbers = np.arange(1, energies.shape[2] + 1)
+    for s in range(energies.shape[0]):
+        if spin:
+            f.write(" spin component %s\n\n"%(s + 1))
+        for k in range(energies.shape[1]):
+            f.write(" k-point %5d :       0.0000    0.0000    0.0000\n"%(k + 1))
+            f.write("  band No.  band energies     occupation \n")
+            f.write("".join(
+                "  %5d  %11.4f  %11.5f\n"%row
+                for row in zip(numbers, energies[s, k], occupations[s, k])
+            ))
+            f.write("\n")
+    f.write("\n%s\n\n\n"%SEPARATOR)
+
+
+def writeOutcar(filePath, steps=3, bands=384, kpoints=1, spin=True,
+        padding=1000, seed=0):
+    """
+    Write a synthetic OUTCAR.
+
+    :steps: Number of ionic steps, each one with an eigenvalue block
+    :bands: Number of bands
+    :kpoints: Number of k-points
+    :spin: If the calculation is spin polarised
+    :padding: Number of lines between the eigenvalue blocks
+    :seed: Seed of the random energies
+
+    """
+    random = np.random.RandomState(seed)
+    nspin = 2 if spin else 1
+    # the first two thirds of the bands are occupied, in the spin polarised
+    # case one band less for the second spin
+    occupied = np.zeros((nspin, kpoints, bands))
+    occupied[:, :, :2*bands//3] = 1.0 if spin else 2.0
+    if spin:
+        occupied[1, :, 2*bands//3 - 1] = 0.0
+    with open(filePath, "w") as f:
+        writeHeader(f, bands, kpoints, spin)
+        for step in range(steps):
+            f.write(PADDING_LINE*padding)
+            energies = np.sort(
+                random.uniform(-10, 25, (nspin, kpoints, bands)), axis=2
+            )
+            writeBlock(f, energies, occupied, spin)
+        f.write(PADDING_LINE*padding)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic OUTCAR")
+    parser.add_argument("file", help="Output file")
+    parser.add_argument("--steps", type=int, default=3, help="Ionic steps")
+    parser.add_argument("--bands", type=int, default=384, help="Bands")
+    parser.add_argument("--kpoints", type=int, default=1, help="K-points")
+    parser.add_argument("--no-spin", action="store_true", help="Unpolarised")
+    parser.add_argument("--padding", type=int, default=1000,
+            help="Lines between the eigenvalue blocks")
+    args = parser.parse_args()
+    writeOutcar(
+        args.file, steps=args.steps, bands=args.bands, kpoints=args.kpoints,
+        spin=not args.no_spin, padding=args.padding
+    )
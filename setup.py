@@ -1,4 +1,9 @@
+import os
 from setuptools import setup
-import smye
 
-setup(**smye.SETUP_INFO)
+# read the metadata without importing the package and its dependencies
+info = {}
+with open(os.path.join(os.path.dirname(__file__), "smye", "info.py")) as f:
+    exec(f.read(), info)
+
+setup(**info["SETUP_INFO"])
@@ -1,27 +1,24 @@
+from smye.info import LOGO, SETUP_INFO
 
-from smye import * 
+VERBOSE=False
 
-def printv(smth, title=""):
+#: Names of smye.smye that are imported on first use, so that importing the
+#: package does not load numpy
+LAZY_NAMES = ("Diagram", "STATE_DTYPE")
+
+__all__ = ["LOGO", "SETUP_INFO", "VERBOSE", "printv"] + list(LAZY_NAMES)
+
+def printv(smth, title="", args=()):
     if VERBOSE:
+        if args:
+            smth = smth%args
         print("%s:: %s"%(title, smth))
 
-LOGO = """
- ____  _  _  _  _  ____ 
-/ ___)( \/ )( \/ )(  __)
-\___ \/ \/ \ )  /  ) _) 
-(____/\_)(_/(__/  (____)
-
-"""
+def __getattr__(name):
+    if name not in LAZY_NAMES:
+        raise AttributeError("module 'smye' has no attribute '%s'"%name)
+    import importlib
+    return getattr(importlib.import_module("smye.smye"), name)
 
-SETUP_INFO = dict(
-    name             = "Show me your electrons",
-    version          = "0.1.1",
-    description      = "A little tool to parse electronic configurations",
-    url              = "http://github.com/alejandrogallo/smye",
-    author           = "Alejandro Gallo",
-    license          = "MIT",
-    packages         = ["smye"],
-    install_requires = [],
-    test_suite       = "smye.tests",
-    scripts          = ["bin/smye"],
-    zip_safe         = False)
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_NAMES))
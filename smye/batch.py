@@ -0,0 +1,317 @@
+"""
+Processing of many files at once, the parsing and the queries are fanned out
+over a pool of processes and the results are gathered in a single table, a
+single Asymptote figure or a single exported dataset.
+"""
+
+import os
+import sys
+import glob
+from concurrent.futures import ProcessPoolExecutor
+
+from smye.smye import Diagram
+
+
+def expandPaths(paths):
+    """
+    Expand the glob patterns in paths, the paths that do not match anything
+    are kept so that their failure is reported later.
+    """
+    result = []
+    for path in paths:
+        matches = sorted(glob.glob(path))
+        result += matches if matches else [path]
+    return result
+
+
+def _results(paths, futures, err, failed):
+    """
+    Yield the tuples (path, result) of the futures of the paths, in the same
+    order. The paths whose processing failed are reported to err and
+    appended to the list failed instead.
+    """
+    for path, future in zip(paths, futures):
+        try:
+            result = future.result()
+        except SystemExit:
+            # the parser exits when it does not find the information
+            err.write("ERROR %s: no electronic information found\n"%path)
+        except Exception as e:
+            err.write("ERROR %s: %s\n"%(path, e))
+        else:
+            yield path, result
+            continue
+        failed.append(path)
+
+
+def getHeader(gap=False, getSpin=False, excited=None):
+    """
+    Get the column names of the answers to the given queries
+    """
+    header = []
+    if gap:
+        header += ["VB", "LB", "BG"]
+    if getSpin:
+        header += ["SPIN"]
+    for n in excited or []:
+        header += ["n=%s"%n]
+    return header
+
+
+def queryDiagram(diagram, gap=False, getSpin=False, excited=None):
+    """
+    Answer the queries on a diagram.
+
+    :gap: Get the band gap
+    :getSpin: Get the netto spin
+    :excited: List of n for the nth excited states, as in
+              Diagram.printNthExcitedState
+    :returns: Answers as a list of strings
+
+    """
+    row = []
+    if gap:
+        valence    = diagram.getHomo()
+        conduction = diagram.getLumo()
+        row += [
+            "%.4f"%valence["energy"],
+            "%.4f"%conduction["energy"],
+            "%.4f"%(conduction["energy"] - valence["energy"])
+        ]
+    if getSpin:
+        row += ["%1.5f"%diagram.getNettoSpin()]
+    for n in excited or []:
+        if n < 0:
+            state = diagram.getNthLeastEnergeticState(abs(n), occupied=False)
+        else:
+            state = diagram.getNthMostEnergeticState(n, occupied=True)
+        row += ["%.4f"%state["energy"]]
+    return row
+
+
+def processFile(filePath, spin=True, gap=False, getSpin=False, excited=None,
+        cache=None):
+    """
+    Parse a file and answer the queries on it.
+
+    :filePath: Path of the file
+    :spin: If the calculation is spin polarised
+    :gap, getSpin, excited: As in queryDiagram
+    :cache: Optional smye.cache.ParseCache to use
+    :returns: Row of the table as a list of strings
+
+    """
+    diagram = Diagram(filePath, spin=spin, cache=cache)
+    return [filePath] + queryDiagram(diagram, gap, getSpin, excited)
+
+
+def run(paths, workers=None, spin=True, gap=False, getSpin=False, excited=None,
+        cache=None, out=sys.stdout, err=sys.stderr):
+    """
+    Process the files in paths with a pool of workers processes and write
+    their results as a table to out, in the same order as the paths. The
+    files that could not be processed are reported to err without stopping
+    the others.
+
+    :paths: List of paths or glob patterns
+    :workers: Number of worker processes, by default the number of cpus
+    :spin, gap, getSpin, excited, cache: As in processFile
+    :returns: Number of files that failed
+
+    """
+    paths  = expandPaths(paths)
+    failed = []
+    out.write(" ".join(["file"] + getHeader(gap, getSpin, excited)) + "\n")
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+        futures = [
+            pool.submit(processFile, path, spin, gap, getSpin, excited, cache)
+            for path in paths
+        ]
+        for path, row in _results(paths, futures, err, failed):
+            out.write(" ".join(row) + "\n")
+            out.flush()
+    return len(failed)
+
+
+def getPanel(filePath, down_offset, up_offset, spin=True, cache=None):
+    """
+    Parse a file and get the states about the Fermi level to draw.
+
+    :returns: Tuple (title, states) as taken by smye.mos.writeFigure
+
+    """
+    diagram = Diagram(filePath, spin=spin, cache=cache)
+    return filePath, diagram.getStatesAboutFermiLevel(down_offset, up_offset)
+
+
+def writeFigure(sources, down_offset, up_offset, workers=None, spin=True,
+        cache=None, out=sys.stdout, err=sys.stderr, **drawing):
+    """
+    Write a single Asymptote document with a panel for every source, in the
+    same order as the sources. The paths are parsed by a pool of workers
+    processes, the Diagram objects are queried directly. The sources that
+    could not be processed are reported to err and left out of the figure.
+
+    :sources: List of Diagram objects, paths or glob patterns
+    :down_offset, up_offset: As in Diagram.getStatesAboutFermiLevel
+    :workers, spin, cache: As in run
+    :drawing: Options of smye.mos.writeFigure, e.g. columns or draw_energy
+    :returns: Number of sources that failed
+
+    """
+    from smye import mos
+    paths = expandPaths([s for s in sources if not isinstance(s, Diagram)])
+    panels = []
+    failed = []
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+        futures = {
+            path: pool.submit(getPanel, path, down_offset, up_offset, spin, cache)
+            for path in paths
+        }
+        for source in sources:
+            if isinstance(source, Diagram):
+                panels.append((
+                    source.filePath,
+                    source.getStatesAboutFermiLevel(down_offset, up_offset)
+                ))
+                continue
+            sourcePaths = expandPaths([source])
+            panels += [
+                panel for path, panel in _results(
+                    sourcePaths, [futures[p] for p in sourcePaths], err, failed
+                )
+            ]
+    if panels:
+        mos.writeFigure(out, panels, **drawing)
+    return len(failed)
+
+
+def getColumns(filePath, spin=True, cache=None, trajectory=False, fileIndex=0):
+    """
+    Parse a file and get its configuration as columns, as in
+    smye.export.getColumns
+    """
+    from smye import export
+    diagram = Diagram(filePath, spin=spin, cache=cache)
+    return export.getColumns(diagram, trajectory, fileIndex)
+
+
+def exportFiles(paths, filePath, workers=None, spin=True, cache=None,
+        trajectory=False, err=sys.stderr):
+    """
+    Export the configurations of many files to a single columnar file, in
+    the same order as the paths. The files are parsed by a pool of workers
+    processes and their columns appended to the file as they arrive. The
+    table of files of the export has all the paths, also the failed ones.
+
+    :paths: List of paths or glob patterns
+    :filePath: Path of the exported file, its extension sets the format
+    :workers, spin, cache: As in run
+    :trajectory: As in smye.export.getColumns
+    :returns: Number of files that failed
+
+    """
+    from smye import export
+    paths  = expandPaths(paths)
+    failed = []
+    writer = export.openWriter(filePath, paths)
+    try:
+        with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+            futures = [
+                pool.submit(getColumns, path, spin, cache, trajectory, fileIndex)
+                for fileIndex, path in enumerate(paths)
+            ]
+            for path, columns in _results(paths, futures, err, failed):
+                writer.write(columns)
+    finally:
+        writer.close()
+    return len(failed)
+
+
+def getDOS(filePath, grid, sigma=0.1, spin=True, cache=None, occupation=False,
+        kpointWeights=None):
+    """
+    Parse a file and get its total density of states on grid, as in
+    Diagram.getDOS summed over the spin channels
+    """
+    diagram = Diagram(filePath, spin=spin, cache=cache)
+    return diagram.getDOS(
+        grid, sigma, kpointWeights=kpointWeights, occupation=occupation
+    )[1].sum(axis=0)
+
+
+def dosFiles(paths, grid, sigma=0.1, workers=None, spin=True, cache=None,
+        occupation=False, kpointWeights=None, out=sys.stdout, err=sys.stderr):
+    """
+    Write the total density of states of many files on the same grid as a
+    table with the energy and a column per file, in the same order as the
+    paths. The files are parsed and broadened by a pool of workers processes.
+
+    :paths: List of paths or glob patterns
+    :grid: Energies at which the DOS is evaluated
+    :sigma, occupation, kpointWeights: As in Diagram.getDOS
+    :workers, spin, cache: As in run
+    :returns: Number of files that failed
+
+    """
+    paths   = expandPaths(paths)
+    failed  = []
+    columns = []
+    names   = []
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+        futures = [
+            pool.submit(
+                getDOS, path, grid, sigma, spin, cache, occupation, kpointWeights
+            )
+            for path in paths
+        ]
+        for path, column in _results(paths, futures, err, failed):
+            columns.append(column)
+            names.append(path)
+    out.write(" ".join(["energy"] + names) + "\n")
+    for energy, values in zip(grid, zip(*columns) if columns else [()]*len(grid)):
+        out.write(" ".join(["%.4f"%energy] + ["%.6f"%v for v in values]) + "\n")
+    return len(failed)
+
+
+def getTransitions(filePath, spin=True, cache=None, **kwargs):
+    """
+    Parse a file and get its transitions, see Diagram.getTransitions
+    """
+    diagram = Diagram(filePath, spin=spin, cache=cache)
+    return diagram.getTransitions(**kwargs)
+
+
+def transitionFiles(paths, workers=None, spin=True, cache=None, out=sys.stdout,
+        err=sys.stderr, **kwargs):
+    """
+    Write the transitions of many files as a table with a row per transition
+    and the file in the first column, in the same order as the paths. The
+    files are parsed by a pool of workers processes.
+
+    :paths: List of paths or glob patterns
+    :workers, spin, cache: As in run
+    :kwargs: Arguments of Diagram.getTransitions
+    :returns: Number of files that failed
+
+    """
+    paths  = expandPaths(paths)
+    failed = []
+    out.write(
+        "file energy initial-spin initial-kpoint initial-number "
+        "final-spin final-kpoint final-number\n"
+    )
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+        futures = [
+            pool.submit(getTransitions, path, spin, cache, **kwargs)
+            for path in paths
+        ]
+        for path, transitions in _results(paths, futures, err, failed):
+            for transition in transitions:
+                initial, final = transition["initial"], transition["final"]
+                out.write("%s %.4f %s %s %s %s %s %s\n"%(
+                    path, transition["energy"], initial["spin"],
+                    initial["kpoint"], initial["number"], final["spin"],
+                    final["kpoint"], final["number"]
+                ))
+    return len(failed)
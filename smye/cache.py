@@ -0,0 +1,142 @@
+"""
+Persistent cache of parsed configurations, so that querying an unchanged file
+again only costs loading a small binary file.
+
+The entries are stored as .npz files named after a hash of the absolute path,
+size and modification time of the parsed file, so that a modified file is
+parsed again. When the cache grows over its maximum size the least recently
+used entries are removed.
+"""
+
+import os
+import hashlib
+import tempfile
+
+import numpy as np
+
+from smye.smye import STATE_DTYPE
+
+#: Default directory of the cache, it can be set with SMYE_CACHE_DIR
+CACHE_DIR = os.environ.get(
+    "SMYE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "smye")
+)
+
+#: Suffix of the entries being written, which are never evicted
+TEMPORARY_SUFFIX = ".tmp"
+
+#: Default maximum size of the cache in bytes
+CACHE_SIZE = 256 << 20
+
+
+class ParseCache(object):
+
+    """
+    On-disk cache of the configurations parsed by Diagram.
+    """
+
+    def __init__(self, directory=CACHE_DIR, maxSize=CACHE_SIZE):
+        self.directory = directory
+        self.maxSize   = maxSize
+
+    def getEntryPath(self, filePath, spin=True):
+        """
+        Get the path of the cache entry of a file, it depends on the path,
+        size and modification time of the file
+        """
+        stat = os.stat(filePath)
+        key = "%s:%s:%s:%s:%s"%(
+            os.path.abspath(filePath), stat.st_size, stat.st_mtime,
+            bool(spin), STATE_DTYPE.descr
+        )
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".npz")
+
+    def load(self, filePath, spin=True):
+        """
+        Load the configuration of a file from the cache.
+
+        :returns: The configuration as in Diagram.getConfiguration or None if
+                  it is not in the cache
+        """
+        entryPath = self.getEntryPath(filePath, spin)
+        try:
+            with np.load(entryPath) as entry:
+                if spin:
+                    configuration = {"1": entry["1"], "2": entry["2"]}
+                else:
+                    configuration = entry["0"]
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+        # mark the entry as recently used, unless it was just evicted
+        try:
+            os.utime(entryPath, None)
+        except FileNotFoundError:
+            pass
+        return configuration
+
+    def store(self, filePath, configuration, spin=True):
+        """
+        Store the configuration of a file in the cache and evict old entries
+        if the cache is too big
+        """
+        entryPath = self.getEntryPath(filePath, spin)
+        os.makedirs(self.directory, exist_ok=True)
+        if spin:
+            arrays = {"1": configuration["1"], "2": configuration["2"]}
+        else:
+            arrays = {"0": configuration}
+        # write to a temporary file first so that concurrent readers never
+        # see half written entries, its suffix keeps it out of evict
+        fd, temporaryPath = tempfile.mkstemp(suffix=TEMPORARY_SUFFIX, dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(temporaryPath, entryPath)
+        except FileNotFoundError:
+            # the directory was removed meanwhile, the entry is not stored
+            return
+        finally:
+            if os.path.exists(temporaryPath):
+                os.remove(temporaryPath)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is not bigger
+        than maxSize
+        """
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        size = sum(entry[1] for entry in entries)
+        for mtime, entrySize, name in sorted(entries):
+            if size <= self.maxSize:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                # evicted by another process meanwhile
+                pass
+            except OSError:
+                continue
+            size -= entrySize
+
+    def clear(self):
+        """
+        Remove all entries of the cache
+        """
+        maxSize, self.maxSize = self.maxSize, -1
+        if os.path.isdir(self.directory):
+            self.evict()
+        self.maxSize = maxSize
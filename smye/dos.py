@@ -0,0 +1,129 @@
+"""
+Gaussian smeared density of states of the parsed levels.
+
+On a uniform energy grid the levels are first deposited on the grid, every
+level split linearly between its two neighbouring grid points, and the
+resulting histogram is convolved with the sampled Gaussian, so that the cost
+grows with the number of levels plus the number of grid points times the
+width of the Gaussian instead of their product. On any other grid the
+Gaussians of the levels are summed directly, in chunks of levels. The same
+is done on uniform grids too coarse for the linear deposit to be accurate.
+"""
+
+import numpy as np
+
+#: Width of the sampled Gaussians in standard deviations
+CUTOFF = 6.0
+
+#: Largest grid spacing, in standard deviations, for which the binned method
+#: is used by default, the error of the linear deposit grows with the spacing
+MAX_BINNED_STEP = 0.25
+
+#: Number of levels summed at once by the direct method
+CHUNK_SIZE = 4096
+
+
+def getGrid(energies, sigma=0.1, points=1000, emin=None, emax=None):
+    """
+    Get a uniform energy grid covering the energies with a margin of CUTOFF
+    standard deviations, or the range [emin, emax] if given
+    """
+    energies = np.asarray(energies)
+    if emin is None:
+        emin = energies.min() - CUTOFF*sigma if energies.size else -1.0
+    if emax is None:
+        emax = energies.max() + CUTOFF*sigma if energies.size else 1.0
+    return np.linspace(emin, emax, points)
+
+
+def _isUniform(grid):
+    if len(grid) < 2:
+        return False
+    steps = np.diff(grid)
+    return steps[0] > 0 and np.allclose(steps, steps[0], rtol=1e-6, atol=0)
+
+
+def _gaussian(x, sigma):
+    return np.exp(-0.5*(x/sigma)**2)/(sigma*np.sqrt(2*np.pi))
+
+
+def _binnedDOS(energies, weights, grid, sigma):
+    step    = grid[1] - grid[0]
+    # the levels outside the grid still contribute through their tails
+    margin  = int(np.ceil(CUTOFF*sigma/step))
+    npoints = len(grid) + 2*margin
+    x       = (energies - grid[0])/step + margin
+    inside  = (x >= 0) & (x < npoints - 1)
+    x, weights = x[inside], weights[inside]
+    lower    = np.floor(x).astype(np.int64)
+    fraction = x - lower
+    histogram = (
+        np.bincount(lower, weights*(1 - fraction), minlength=npoints) +
+        np.bincount(lower + 1, weights*fraction, minlength=npoints)
+    )
+    kernel = _gaussian(step*np.arange(-margin, margin + 1), sigma)
+    return np.convolve(histogram, kernel, mode="valid")
+
+
+def _directDOS(energies, weights, grid, sigma):
+    dos = np.zeros(len(grid))
+    for start in range(0, len(energies), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        dos += weights[chunk].dot(
+            _gaussian(grid[np.newaxis] - energies[chunk, np.newaxis], sigma)
+        )
+    return dos
+
+
+def getDOS(states, grid, sigma=0.1, kpointWeights=None, spinWeights=None,
+        occupation=False, method=None):
+    """
+    Get the density of states of every spin channel.
+
+    :states: Array of states of shape (spin, kpoint, band), as given by
+             Diagram._getStates
+    :grid: Energies at which the DOS is evaluated
+    :sigma: Standard deviation of the Gaussian smearing
+    :kpointWeights: Weights of the k-points, by default all equal, they are
+                    normalised to sum 1
+    :spinWeights: Weights of the spin channels, by default 1 for every
+                  channel, or 2 if there is only one (unpolarised)
+    :occupation: Weight every level with its occupation instead of the spin
+                 weight, giving the density of occupied states
+    :method: "binned" or "direct", by default binned on uniform grids
+             finer than MAX_BINNED_STEP
+    :returns: Array of shape (spin, len(grid))
+
+    """
+    grid   = np.asarray(grid, dtype=np.float64)
+    states = np.asarray(states)
+    nspin, nkpoints = states.shape[:2]
+    if kpointWeights is None:
+        kpointWeights = np.ones(nkpoints)
+    kpointWeights = np.asarray(kpointWeights, dtype=np.float64)
+    if len(kpointWeights) != nkpoints:
+        raise Exception(
+            "There are %s k-points but %s weights"%(nkpoints, len(kpointWeights))
+        )
+    kpointWeights = kpointWeights/kpointWeights.sum()
+    if spinWeights is None:
+        spinWeights = np.ones(nspin) if nspin > 1 else np.array([2.0])
+    if method is None:
+        fine   = len(grid) > 1 and grid[1] - grid[0] <= MAX_BINNED_STEP*sigma
+        method = "binned" if fine and _isUniform(grid) else "direct"
+    if method == "binned" and not _isUniform(grid):
+        raise Exception("The binned DOS needs a uniform increasing grid")
+    broaden = _binnedDOS if method == "binned" else _directDOS
+
+    dos = np.zeros((nspin, len(grid)))
+    for spin in range(nspin):
+        levels  = states[spin]
+        weights = np.repeat(kpointWeights, levels.shape[1]).reshape(levels.shape)
+        if occupation:
+            weights = weights*levels["occupation"]
+        else:
+            weights = weights*spinWeights[spin]
+        dos[spin] = broaden(
+            levels["energy"].ravel(), weights.ravel(), grid, sigma
+        )
+    return dos
@@ -0,0 +1,183 @@
+"""
+Export of parsed configurations to columnar binary files, one row per state
+with the columns in COLUMNS, so that they can be loaded in bulk without
+parsing the text output.
+
+The paths of the exported files are stored once, the column file holds the
+index of the path of every state in this table: the member files of .npz
+files, the dictionary of the column in .parquet and .arrow files.
+
+The format is chosen by the extension of the file: .npz is always available,
+.parquet and .arrow/.feather need pyarrow.
+"""
+
+import os
+import shutil
+import zipfile
+import tempfile
+
+import numpy as np
+
+#: Names of the exported columns
+COLUMNS = (
+    "file", "step", "spin", "kpoint", "band", "energy", "occupation"
+)
+
+
+def getColumns(diagram, trajectory=False, fileIndex=0):
+    """
+    Get the configuration of a diagram as columns.
+
+    :diagram: smye.Diagram to export
+    :trajectory: Export every ionic step instead of only the last one, the
+                 last one has step -1 otherwise
+    :fileIndex: Index of the file of the diagram in the table of files
+    :returns: Dictionary of one dimensional arrays keyed by COLUMNS
+
+    """
+    if trajectory:
+        states = diagram.getTrajectory()
+    else:
+        states = diagram._getStates()[np.newaxis]
+    steps = np.arange(states.shape[0]) if trajectory else np.array([-1])
+    step = np.broadcast_to(
+        steps.reshape(-1, 1, 1, 1), states.shape
+    ).ravel()
+    states = states.ravel()
+    return {
+        "file": np.full(len(states), fileIndex, dtype=np.int32),
+        "step": step.astype(np.int32),
+        "spin": states["spin"],
+        "kpoint": states["kpoint"],
+        "band": states["number"],
+        "energy": states["energy"],
+        "occupation": states["occupation"],
+    }
+
+
+class NpzWriter(object):
+
+    """
+    Writer of the columns to a numpy .npz file. The length of an array is
+    written before its data, so the columns of every write are appended to
+    a temporary file per column and copied to the archive on close, only
+    the columns of a single write are held in memory.
+    """
+
+    def __init__(self, filePath, files):
+        self.filePath = filePath
+        self.files    = list(files)
+        self._spills  = {name: tempfile.TemporaryFile() for name in COLUMNS}
+        self._dtypes  = {}
+        self._length  = 0
+
+    def write(self, columns):
+        for name in COLUMNS:
+            column = columns[name]
+            dtype  = self._dtypes.setdefault(name, column.dtype)
+            self._spills[name].write(np.ascontiguousarray(column, dtype).tobytes())
+        self._length += len(columns[COLUMNS[0]])
+
+    def close(self):
+        # np.savez takes the name file for itself, so the archive is written
+        # by hand in the same layout
+        try:
+            with zipfile.ZipFile(self.filePath, "w", allowZip64=True) as archive:
+                for name in COLUMNS:
+                    spill = self._spills[name]
+                    spill.seek(0)
+                    with archive.open(name + ".npy", "w", force_zip64=True) as f:
+                        np.lib.format.write_array_header_2_0(f, {
+                            "descr": np.lib.format.dtype_to_descr(
+                                self._dtypes.get(name, np.dtype(np.float64))
+                            ),
+                            "fortran_order": False,
+                            "shape": (self._length,),
+                        })
+                        shutil.copyfileobj(spill, f)
+                with archive.open("files.npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array(
+                        f, np.array(self.files, dtype=str), allow_pickle=False
+                    )
+        finally:
+            for spill in self._spills.values():
+                spill.close()
+
+
+class ArrowWriter(object):
+
+    """
+    Writer of the columns to a Parquet or Arrow IPC file with pyarrow, every
+    write is streamed as a row group or record batch. The column file is
+    dictionary encoded with the same dictionary of files in every write, as
+    Arrow IPC files allow a single one.
+    """
+
+    def __init__(self, filePath, files, parquet=True):
+        import pyarrow
+        self.filePath = filePath
+        self.parquet  = parquet
+        self._writer  = None
+        self._pyarrow = pyarrow
+        self._files   = pyarrow.array(list(files), type=pyarrow.string())
+
+    def write(self, columns):
+        arrays = [columns[name] for name in COLUMNS]
+        arrays[COLUMNS.index("file")] = self._pyarrow.DictionaryArray.from_arrays(
+            columns["file"], self._files
+        )
+        table = self._pyarrow.table(arrays, names=list(COLUMNS))
+        if self._writer is None:
+            if self.parquet:
+                import pyarrow.parquet
+                self._writer = pyarrow.parquet.ParquetWriter(
+                    self.filePath, table.schema
+                )
+            else:
+                import pyarrow.ipc
+                self._writer = pyarrow.ipc.new_file(self.filePath, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def openWriter(filePath, files):
+    """
+    Get a writer for the format given by the extension of filePath.
+
+    :files: Paths of the exported files, indexed by the column file
+    :returns: Object with write(columns) and close() methods
+
+    """
+    extension = os.path.splitext(filePath)[1].lower()
+    if extension == ".npz":
+        return NpzWriter(filePath, files)
+    if extension in (".parquet", ".arrow", ".feather"):
+        try:
+            return ArrowWriter(filePath, files, parquet=extension == ".parquet")
+        except ImportError:
+            raise Exception(
+                "Writing %s files needs pyarrow, install it or use .npz"%extension
+            )
+    raise Exception(
+        "Unknown export format %s, use .npz, .parquet or .arrow"%extension
+    )
+
+
+def export(diagrams, filePath, trajectory=False):
+    """
+    Write the configurations of many diagrams to a single file.
+
+    :diagrams: List of smye.Diagram
+    :filePath: Path of the file, its extension sets the format
+    :trajectory: As in getColumns
+
+    """
+    writer = openWriter(filePath, [diagram.filePath for diagram in diagrams])
+    try:
+        for fileIndex, diagram in enumerate(diagrams):
+            writer.write(getColumns(diagram, trajectory, fileIndex))
+    finally:
+        writer.close()
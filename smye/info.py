@@ -0,0 +1,25 @@
+"""
+Metadata of the package, it does not import anything so that setup.py and
+the --version flag of the CLI can read it without loading the package.
+"""
+
+LOGO = r"""
+ ____  _  _  _  _  ____ 
+/ ___)( \/ )( \/ )(  __)
+\___ \/ \/ \ )  /  ) _) 
+(____/\_)(_/(__/  (____)
+
+"""
+
+SETUP_INFO = dict(
+    name             = "Show me your electrons",
+    version          = "0.1.1",
+    description      = "A little tool to parse electronic configurations",
+    url              = "http://github.com/alejandrogallo/smye",
+    author           = "Alejandro Gallo",
+    license          = "MIT",
+    packages         = ["smye"],
+    install_requires = ["numpy"],
+    test_suite       = "smye.tests",
+    scripts          = ["bin/smye"],
+    zip_safe         = False)
@@ -0,0 +1,113 @@
+"""
+Instrumentation of the phases of the parsing and the queries of Diagram.
+
+A Profiler given to a Diagram records for every phase (open, locate,
+tokenize, sort, query...) the number of calls, the wall time, the bytes
+processed and the number of states produced, and optionally passes every
+measurement to a callback.
+"""
+
+import sys
+import time
+import functools
+import contextlib
+
+
+class Record(object):
+
+    """
+    Measurements of a phase, the code of the phase adds to bytes and states
+    """
+
+    __slots__ = ("name", "calls", "seconds", "bytes", "states")
+
+    def __init__(self, name):
+        self.name    = name
+        self.calls   = 0
+        self.seconds = 0.0
+        self.bytes   = 0
+        self.states  = 0
+
+
+#: Record given to the phases when there is no profiler, its values are never
+#: read
+NULL_RECORD = Record("null")
+
+
+class Profiler(object):
+
+    """
+    Recorder of the time, bytes and states of the phases of a Diagram. The
+    nested calls of a phase that is already running, e.g. a query calling
+    another query, are accounted to the outermost one.
+    """
+
+    def __init__(self, callback=None):
+        """
+        :callback: Optional function called as
+                   callback(name, seconds, bytes, states) after every phase
+        """
+        self.callback = callback
+        self.records  = {}
+        self._running = set()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Context manager measuring a phase, it yields the Record of the phase
+        so that the bytes and states can be added to it
+        """
+        if name in self._running:
+            yield self.records[name]
+            return
+        record = self.records.get(name)
+        if record is None:
+            record = self.records[name] = Record(name)
+        bytes, states = record.bytes, record.states
+        self._running.add(name)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            self._running.discard(name)
+            record.calls   += 1
+            record.seconds += seconds
+            if self.callback is not None:
+                self.callback(
+                    name, seconds, record.bytes - bytes, record.states - states
+                )
+
+    def reset(self):
+        self.records = {}
+
+    def report(self, out=sys.stderr):
+        """
+        Write the breakdown of the phases to out, in the order in which they
+        ran first. The time of a phase includes the phases it runs, e.g. the
+        sorting run by a query
+        """
+        out.write("%-12s %6s %12s %12s %10s\n"%(
+            "phase", "calls", "time [ms]", "bytes", "states"
+        ))
+        for record in self.records.values():
+            out.write("%-12s %6d %12.3f %12d %10d\n"%(
+                record.name, record.calls, 1e3*record.seconds,
+                record.bytes, record.states
+            ))
+
+
+def profiled(name):
+    """
+    Decorator of the methods of objects with a profiler attribute, the calls
+    are measured as the phase name when the profiler is not None
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.profiler is None:
+                return method(self, *args, **kwargs)
+            with self.profiler.phase(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
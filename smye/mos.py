@@ -1,48 +1,9 @@
+import io
 import string
 
-def MOS_ASYMPTOTE(
-        states,
-        bandgap=None,
-        title="Title",
-        draw_band=False,
-        draw_occupation=False,
-        draw_energy=False
-        ):
-    """
-
-    :states: TODO
-    :returns: TODO
-
-    """
-    energies    = "{"
-    spins       = "{"
-    occupations = "{"
-    bands       = "{"
-
-    STATES_STRING=""
-    if not bandgap:
-        VB = max([s["energy"] for s in states])
-        LB = min([s["energy"] for s in states])
-        draw_band_gap = "false"
-    else:
-        VB = bandgap[1]
-        LB = bandgap[0]
-        draw_band_gap = "true"
-    for state in states:
-        energy = str(state["energy"])
-        spin = str(state["spin"])
-        occupation = str(state["occupation"])
-        band = str(state["number"])
-        STATES_STRING += """\
-//energy, spin, occupation, band
-state(%s, %s, %s, %s)
-.setAutoPosition()
-.draw(
-    draw_band = DRAW_BAND,
-    draw_occupation = DRAW_OCCUPATION,
-    draw_energy = DRAW_ENERGY
-);\n\n"""%(energy, spin, occupation, band)
-    return string.Template("""
+#: Settings and definition of the state struct, substituted with the title,
+#: band edges and drawing flags. It is written once per document
+HEADER = string.Template("""
 currentpen = fontsize(20);
 
 string LUMO_TITLE = "$title";
@@ -126,7 +87,7 @@ struct state {
     return this;
   };
   state setAutoPosition (){
-    int controller = state_count%%2;
+    int controller = state_count%2;
     X_COORD=0+controller*(DASH_WIDTH);
     return this;
   };
@@ -195,7 +156,10 @@ struct state {
 };
 
 
+""")
 
+#: Title and band edge boxes of a diagram
+FRAME = """
 //----------------------------
 //-  Valence and Cond bands  -
 //----------------------------
@@ -219,7 +183,24 @@ filldraw(UNTERKANTE_BOX , bandStyle, bandStyle);
 /* DRAW STATES */
 /***************/
 
-$states
+"""
+
+#: Drawing of the states stored in the ENERGIES, SPINS, OCCUPATIONS and BANDS
+#: arrays
+STATES = """\
+for (int i = 0; i < ENERGIES.length; ++i) {
+  state(ENERGIES[i], SPINS[i], OCCUPATIONS[i], BANDS[i])
+  .setAutoPosition()
+  .draw(
+      draw_band = DRAW_BAND,
+      draw_occupation = DRAW_OCCUPATION,
+      draw_energy = DRAW_ENERGY
+  );
+}
+"""
+
+#: Scale and band gap
+FOOTER = """
 
 //-----------
 //-  SCALE  -
@@ -247,16 +228,149 @@ for ( int i = 0; i <= steps; i+=1 ) {
   // SCALE LABELS
   label(scale(0.7)*(string)pointsToEnergy(width*i), (1,width*i), E, Fill(white));
 }
+"""
 
+TRAILER = """
 // vim: nospell
-""").safe_substitute(
-    title=title,
-    LB=LB,
-    VB=VB,
-    draw_energy=str(draw_energy).lower(),
-    draw_band_gap=str(draw_band_gap).lower(),
-    draw_band=str(draw_band).lower(),
-    draw_occupation=str(draw_occupation).lower(),
-    states=STATES_STRING
-)
+"""
+
+#: Horizontal and vertical distance between the panels of a figure
+PANEL_WIDTH = 90
+PANEL_HEIGHT = 170
+
+
+def _writeArray(out, name, values, format):
+    out.write("real[] %s = {"%name)
+    out.write(", ".join(format % value for value in values))
+    out.write("};\n")
+
+
+def writeStates(out, states):
+    """
+    Write the data of the states as Asymptote arrays, so that the script
+    loops over them instead of having the drawing code repeated per state.
+    """
+    _writeArray(out, "ENERGIES", [float(s["energy"]) for s in states], "%.4f")
+    _writeArray(out, "SPINS", [int(s["spin"]) for s in states], "%d")
+    _writeArray(out, "OCCUPATIONS", [float(s["occupation"]) for s in states], "%.5f")
+    _writeArray(out, "BANDS", [int(s["number"]) for s in states], "%d")
+    out.write("\n")
+    out.write(STATES)
+
+
+def _getBandEdges(states, bandgap=None):
+    """
+    Get the (LB, VB, drawBandGap) of a diagram, by default the band edges
+    are the extremal energies of the states
+    """
+    if not bandgap:
+        energies = [float(s["energy"]) for s in states]
+        return min(energies), max(energies), False
+    return bandgap[0], bandgap[1], True
 
+
+def _formatTitle(title):
+    return str(title).replace('"', "'")
+
+
+def writeAsymptote(
+        out,
+        states,
+        bandgap=None,
+        title="Title",
+        draw_band=False,
+        draw_occupation=False,
+        draw_energy=False
+        ):
+    """
+    Write the Asymptote script drawing the states to the stream out in one
+    pass.
+
+    :out: Stream to write to
+    :states: States to draw, e.g. from Diagram.getStatesAboutFermiLevel
+    :bandgap: Optional (LB, VB) energies of the band edges, by default the
+              extremal energies of the states are taken
+
+    """
+    LB, VB, draw_band_gap = _getBandEdges(states, bandgap)
+    out.write(HEADER.safe_substitute(
+        title=_formatTitle(title),
+        LB=LB,
+        VB=VB,
+        draw_energy=str(draw_energy).lower(),
+        draw_band_gap=str(draw_band_gap).lower(),
+        draw_band=str(draw_band).lower(),
+        draw_occupation=str(draw_occupation).lower()
+    ))
+    out.write(FRAME)
+    writeStates(out, states)
+    out.write(FOOTER)
+    out.write(TRAILER)
+
+
+def writeFigure(
+        out,
+        panels,
+        columns=3,
+        bandgap=None,
+        draw_band=False,
+        draw_occupation=False,
+        draw_energy=False
+        ):
+    """
+    Write a single Asymptote document drawing many diagrams, one per panel
+    in a grid. The settings and the state struct are written only once and
+    every panel is drawn into its own picture, which is then shifted to its
+    place in the grid.
+
+    :out: Stream to write to
+    :panels: List of (title, states) tuples
+    :columns: Number of panels per row
+    :bandgap: Optional (LB, VB) energies of the band edges of all the panels,
+              by default the extremal energies of the states of every panel
+
+    """
+    if not panels:
+        raise ValueError("No diagrams to draw")
+    LB, VB, draw_band_gap = _getBandEdges(panels[0][1], bandgap)
+    out.write(HEADER.safe_substitute(
+        title=_formatTitle(panels[0][0]),
+        LB=LB,
+        VB=VB,
+        draw_energy=str(draw_energy).lower(),
+        draw_band_gap=str(draw_band_gap).lower(),
+        draw_band=str(draw_band).lower(),
+        draw_occupation=str(draw_occupation).lower()
+    ))
+    out.write("picture FIGURE = currentpicture;\n")
+    for i, (title, states) in enumerate(panels):
+        LB, VB, _ = _getBandEdges(states, bandgap)
+        out.write("\n//  PANEL %s\n"%(i + 1))
+        out.write("currentpicture = new picture;\n")
+        out.write('LUMO_TITLE = "%s";\n'%_formatTitle(title))
+        out.write("ENERGIE_LB_PRISTINE = %s;\n"%LB)
+        out.write("ENERGIE_VB_PRISTINE = %s;\n"%VB)
+        # a block, so that the arrays and the scale of every panel are local
+        out.write("{\n")
+        out.write(FRAME)
+        writeStates(out, states)
+        out.write(FOOTER)
+        out.write("}\n")
+        out.write("add(FIGURE, shift(%s, %s)*currentpicture);\n"%(
+            (i % columns)*PANEL_WIDTH, -(i // columns)*PANEL_HEIGHT
+        ))
+    out.write("\ncurrentpicture = FIGURE;\n")
+    out.write(TRAILER)
+
+
+def MOS_ASYMPTOTE(states, *args, **kwargs):
+    """
+    Get the Asymptote script drawing the states, see writeAsymptote for the
+    arguments.
+
+    :returns: The script as a string
+
+    """
+    out = io.StringIO()
+    writeAsymptote(out, states, *args, **kwargs)
+    return out.getvalue()
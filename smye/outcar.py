@@ -0,0 +1,508 @@
+"""
+Low level helpers to locate the electronic structure information inside of a
+file in the OUTCAR format without having to read the whole file into memory.
+"""
+
+import os
+import bz2
+import gzip
+import lzma
+import mmap
+
+import numpy as np
+
+#: Size in bytes of the chunks read while scanning a file
+BLOCK_SIZE = 1 << 20
+
+#: Header of every eigenvalue table
+BAND_HEADER = b"  band No.  band energies     occupation "
+
+
+def tokenizeTable(body):
+    """
+    Turn the body of an eigenvalue table, i.e. the lines after its header,
+    into numeric columns. The whole body is split and converted at once; only
+    if this fails, for instance because the table is followed by other text
+    or has overflowing fields, it is parsed line by line up to the first line
+    that is not a row of the table.
+
+    :body: Text of the table as bytes or str
+    :returns: Float array of shape (bands, 3) with the columns band number,
+              energy and occupation
+
+    """
+    try:
+        values = np.array(body.split(), dtype=np.float64)
+    except ValueError:
+        values = None
+    if values is None or values.size % 3:
+        return _tokenizeLines(body)
+    return values.reshape(-1, 3)
+
+
+def _tokenizeLines(body):
+    rows = []
+    for line in body.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        try:
+            row = [float(field) for field in fields]
+        except ValueError:
+            break
+        if len(row) != 3:
+            break
+        rows.append(row)
+    return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+
+def tokenizeTables(text):
+    """
+    Turn all the eigenvalue tables found in text into numeric columns. Every
+    table starts after its header and ends at the first empty line.
+
+    :text: Text with the tables as bytes or str
+    :returns: Tuple (kpoints, tables) with the k-point of every table and
+              the arrays returned by tokenizeTable
+
+    """
+    if isinstance(text, bytes):
+        header, newline, end = BAND_HEADER, b"\n", b"\n\n"
+    else:
+        header, newline, end = BAND_HEADER.decode(), "\n", "\n\n"
+    kpoints  = []
+    tables   = []
+    position = text.find(header)
+    while position != -1:
+        kpoints.append(_getKpoint(text, position, newline)[0])
+        start = text.find(newline, position) + 1
+        stop  = text.find(end, start)
+        if stop == -1:
+            stop = len(text)
+        tables.append(tokenizeTable(text[start:stop]))
+        position = text.find(header, stop)
+    return kpoints, tables
+
+
+def _getKpoint(text, position, newline=b"\n"):
+    """
+    Get the k-point of the table whose header is at position, written in the
+    line before the header.
+
+    :returns: Tuple (kpoint, offset of the k-point line), the k-point is 1 if
+              there is no k-point line
+    """
+    lineStart = text.rfind(newline, max(0, position - 256), position - 1) + 1
+    fields    = text[lineStart:position].split()
+    if fields[:1] in ([b"k-point"], ["k-point"]):
+        return int(fields[1]), lineStart
+    return 1, position
+
+
+#: Number of bytes read to detect the compression of a file
+MAGIC_SIZE = 6
+
+#: Magic bytes at the start of compressed files and the function to open them
+COMPRESSIONS = (
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+)
+
+
+def getCompression(filePath):
+    """
+    Detect if a file is compressed with gzip, bzip2 or xz by its first bytes.
+
+    :returns: The function opening the file, e.g. gzip.open, or None if the
+              file is not compressed
+
+    """
+    with open(filePath, "rb") as fd:
+        magic = fd.read(MAGIC_SIZE)
+    for prefix, opener in COMPRESSIONS:
+        if magic.startswith(prefix):
+            return opener
+    return None
+
+
+def openFile(filePath):
+    """
+    Open a file for reading bytes, decompressing it on the fly if it is
+    compressed
+    """
+    opener = getCompression(filePath)
+    if opener is None:
+        return open(filePath, "rb")
+    return opener(filePath, "rb")
+
+
+def iterBlocks(fd, spin=True, blockSize=BLOCK_SIZE):
+    """
+    Read a file forwards and yield its complete eigenvalue blocks, keeping in
+    memory only the block being scanned. Unlike rfind it does not seek, so it
+    works also on streams of decompressed data.
+    """
+    scanner = BlockScanner(spin)
+    for data in iter(lambda: fd.read(blockSize), b""):
+        for block in scanner.feed(data):
+            yield block
+
+
+def streamLastBlock(fd, spin=True, blockSize=BLOCK_SIZE):
+    """
+    Read the last eigenvalue block of a stream, as readLastBlock does for
+    files that can be read backwards.
+
+    :returns: The bytes of the block, empty if no block was found
+
+    """
+    block = b""
+    for block in iterBlocks(fd, spin, blockSize):
+        pass
+    return block
+
+
+def streamFermiEnergy(fd, blockSize=BLOCK_SIZE):
+    """
+    Read the Fermi energy of the last 'E-fermi' line of a stream, as
+    readFermiEnergy does for files that can be read backwards.
+
+    :returns: The energy as a float or None if there is no such line
+
+    """
+    line  = None
+    carry = b""
+    for data in iter(lambda: fd.read(blockSize), b""):
+        data = carry + data
+        position = data.rfind(b"E-fermi")
+        if position != -1:
+            end = data.find(b"\n", position)
+            if end == -1:
+                # the line continues in the next piece
+                carry = data[position:]
+                continue
+            line = data[position:end]
+        carry = data[-len(b"E-fermi") + 1:]
+    if carry.startswith(b"E-fermi"):
+        line = carry
+    return None if line is None else _getFermiEnergy(line)
+
+
+def _getFermiEnergy(line):
+    fields = line.split(b":", 1)[1].split() if b":" in line else []
+    try:
+        return float(fields[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def scanRange(fd, start, end, spin=True, blockSize=BLOCK_SIZE):
+    """
+    Get the eigenvalue blocks of a file starting in the byte range
+    [start, end), the ones straddling end are read up to their end. The
+    blocks of the ranges of a partition of the file are the ones of a scan of
+    the whole file, so the ranges can be scanned independently.
+
+    :returns: List of tuples (offset, block) as given by BlockScanner.scan
+
+    """
+    scanner = BlockScanner(spin, start)
+    blocks  = []
+    fd.seek(start)
+    while scanner.offset < end:
+        data = fd.read(blockSize)
+        if not data:
+            break
+        blocks += [block for block in scanner.scan(data) if block[0] < end]
+    return blocks
+
+
+def rfind(fd, needle, end=None, blockSize=BLOCK_SIZE):
+    """
+    Find the offset of the last occurrence of needle that starts before the
+    offset end, reading the file backwards in blocks of blockSize bytes.
+
+    :fd: File object opened in binary mode
+    :needle: Bytes to look for
+    :end: Offset where to start looking backwards, by default the end of file
+    :returns: Offset of the match or -1 if it was not found
+
+    """
+    if end is None:
+        fd.seek(0, os.SEEK_END)
+        end = fd.tell()
+    overlap = len(needle) - 1
+    while end > 0:
+        start = max(0, end - blockSize)
+        fd.seek(start)
+        # read a little bit past the window so that matches straddling two
+        # blocks are also found
+        chunk = fd.read(end - start + overlap)
+        position = chunk.rfind(needle, 0, end - start + overlap)
+        if position != -1:
+            return start + position
+        end = start
+    return -1
+
+
+def find(fd, needle, start=0, blockSize=BLOCK_SIZE):
+    """
+    Find the offset of the first occurrence of needle after the offset start,
+    reading the file forwards in blocks of blockSize bytes.
+
+    :fd: File object opened in binary mode
+    :needle: Bytes to look for
+    :start: Offset where to start looking
+    :returns: Offset of the match or -1 if it was not found
+
+    """
+    overlap = len(needle) - 1
+    while True:
+        fd.seek(start)
+        chunk = fd.read(blockSize + overlap)
+        position = chunk.find(needle)
+        if position != -1:
+            return start + position
+        if len(chunk) < blockSize + overlap:
+            return -1
+        start += blockSize
+
+
+def lastBlockRange(fd, spin=True, blockSize=BLOCK_SIZE):
+    """
+    Get the offsets delimiting the last eigenvalue block of the file.
+
+    For spin polarised calculations the block starts at the last
+    'spin component 1' line and ends with the separator following the last
+    'spin component 2' line. For unpolarised calculations it starts at the
+    E-fermi line preceding the last table header, so that the tables of all
+    k-points are included, and ends with the separator that follows it.
+
+    :returns: Tuple (start, end) or None if no block was found
+
+    """
+    if spin:
+        second = rfind(fd, b"spin component 2", blockSize=blockSize)
+        if second == -1:
+            return None
+        start = rfind(fd, b"spin component 1", second, blockSize)
+        if start == -1:
+            return None
+        separator = b"-----"
+    else:
+        start = second = rfind(fd, BAND_HEADER, blockSize=blockSize)
+        if start == -1:
+            return None
+        fermi = rfind(fd, b"E-fermi", second, blockSize)
+        if fermi != -1:
+            start = fermi
+        separator = b"-------"
+    end = find(fd, separator, second, blockSize)
+    if end == -1:
+        fd.seek(0, os.SEEK_END)
+        end = fd.tell()
+    else:
+        end += len(separator)
+    return start, end
+
+
+def readFermiEnergy(fd, end=None, blockSize=BLOCK_SIZE):
+    """
+    Read the Fermi energy of the last 'E-fermi' line before the offset end.
+
+    :returns: The energy as a float or None if there is no such line
+
+    """
+    position = rfind(fd, b"E-fermi", end, blockSize)
+    if position == -1:
+        return None
+    fd.seek(position)
+    return _getFermiEnergy(fd.readline())
+
+
+def readLastBlock(fd, spin=True, blockSize=BLOCK_SIZE):
+    """
+    Read the last eigenvalue block of the file, so that only the size of
+    the block and not the size of the file has to be kept in memory.
+
+    :returns: The bytes of the block, empty if no block was found
+
+    """
+    blockRange = lastBlockRange(fd, spin, blockSize)
+    if blockRange is None:
+        return b""
+    start, end = blockRange
+    fd.seek(start)
+    return fd.read(end - start)
+
+
+class OutcarIndex(object):
+
+    """
+    Index of all the eigenvalue tables of a file in the OUTCAR format.
+
+    The file is memory mapped and scanned only once, recording the byte
+    offsets of every ionic step, spin component and k-point table, so that
+    any table can be later retrieved by (step, spin, kpoint) without
+    rereading the file.
+
+    Spin is 0 for unpolarised calculations and 1 or 2 otherwise, k-points are
+    numbered from 1 as in the OUTCAR and steps are numbered from 0.
+    """
+
+    def __init__(self, filePath):
+        self.filePath = filePath
+        #: Offsets of the first table of every ionic step
+        self.steps    = []
+        #: Offsets of the spin component lines indexed by (step, spin)
+        self.spins    = {}
+        #: Offsets (start, end) of the table bodies indexed by
+        #: (step, spin, kpoint)
+        self.tables   = {}
+        self._fd      = open(filePath, "rb")
+        self._mmap    = None
+        if os.fstat(self._fd.fileno()).st_size:
+            self._mmap = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+            self._scan()
+
+    def _scan(self):
+        mm       = self._mmap
+        spin     = 0
+        previous = None
+        position = mm.find(BAND_HEADER)
+        while position != -1:
+            # the line before the header tells the k-point of the table
+            kpoint, kpointStart = _getKpoint(mm, position)
+            # the spin component line is only present before the first k-point
+            window    = mm[max(0, kpointStart - 64):kpointStart]
+            spinIndex = window.rfind(b"spin component ")
+            if spinIndex != -1:
+                spin = int(window[spinIndex + 15:spinIndex + 16])
+                spinStart = kpointStart - len(window) + spinIndex
+            else:
+                spinStart = kpointStart
+            if previous is None or (spin, kpoint) <= previous:
+                self.steps.append(spinStart)
+            previous = (spin, kpoint)
+            step = len(self.steps) - 1
+            self.spins.setdefault((step, spin), spinStart)
+            start = mm.find(b"\n", position) + 1
+            end   = mm.find(b"\n\n", start)
+            if end == -1:
+                end = len(mm)
+            self.tables[(step, spin, kpoint)] = (start, end)
+            position = mm.find(BAND_HEADER, end)
+
+    @property
+    def nsteps(self):
+        return len(self.steps)
+
+    def getSpins(self):
+        """
+        :returns: Sorted list of the spin components present in the file
+        """
+        return sorted(set(spin for step, spin in self.spins))
+
+    def getKpoints(self):
+        """
+        :returns: Sorted list of the k-points present in the file
+        """
+        return sorted(set(key[2] for key in self.tables))
+
+    def getTable(self, step=-1, spin=0, kpoint=1):
+        """
+        Get the body of an eigenvalue table, negative steps are counted from
+        the last ionic step.
+
+        :returns: Bytes of the table without its header
+        """
+        if step < 0:
+            step += self.nsteps
+        try:
+            start, end = self.tables[(step, spin, kpoint)]
+        except KeyError:
+            raise KeyError(
+                "No table for step %s, spin %s and k-point %s in %s"
+                %(step, spin, kpoint, self.filePath)
+            )
+        return self._mmap[start:end]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._fd.close()
+
+
+class BlockScanner(object):
+
+    """
+    Incremental scanner of the eigenvalue blocks of a file in the OUTCAR
+    format that is read piece by piece, for instance while it is still being
+    written.
+
+    Only the data after the last complete block, starting from the last
+    possible beginning of a block, is kept, so the memory needed is of the
+    order of the size of one block.
+    """
+
+    def __init__(self, spin=True, offset=0):
+        """
+        :spin: Scan the blocks of a spin polarised file
+        :offset: Offset in the file of the first byte to be fed
+        """
+        self.spin = spin
+        if spin:
+            self._markers = (b"spin component 1", b"spin component 2", b"-----")
+        else:
+            self._markers = (b"E-fermi", BAND_HEADER, b"-------")
+        self._buffer = b""
+        #: Offset in the file of the data kept, no block starts before it
+        self.offset  = offset
+
+    def _drop(self, count):
+        self._buffer = self._buffer[count:]
+        self.offset += count
+
+    def feed(self, data):
+        """
+        Feed the next piece of the file to the scanner.
+
+        :data: Bytes following the ones previously fed
+        :returns: List with the bytes of the blocks completed by data
+
+        """
+        return [block for offset, block in self.scan(data)]
+
+    def scan(self, data):
+        """
+        As feed, but the blocks are given together with their offsets in the
+        file as tuples (offset, block)
+        """
+        begin, middle, separator = self._markers
+        self._buffer += data
+        blocks = []
+        while True:
+            start = self._buffer.find(begin)
+            if start == -1:
+                # keep what could be the beginning of a marker
+                self._drop(max(len(self._buffer) - len(begin) + 1, 0))
+                break
+            self._drop(start)
+            second = self._buffer.find(middle, len(begin))
+            if second == -1:
+                # only the last beginning can start the next block
+                self._drop(self._buffer.rfind(begin))
+                break
+            # as in lastBlockRange the block starts at the last beginning
+            # before its middle marker
+            start = self._buffer.rfind(begin, 0, second)
+            self._drop(start)
+            second -= start
+            end = self._buffer.find(separator, second)
+            if end == -1:
+                break
+            end += len(separator)
+            blocks.append((self.offset, self._buffer[:end]))
+            self._drop(end)
+        return blocks
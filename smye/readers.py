@@ -0,0 +1,275 @@
+"""
+Reader backends of the files holding the electronic structure, Diagram parses
+its input through the reader picked by getReader from the first bytes of the
+file.
+
+OUTCAR files are parsed by Diagram itself, scanning for the last eigenvalue
+block. EIGENVAL files, which hold only the eigenvalues and are much smaller,
+are tokenized at once. vasprun.xml files are read incrementally with
+iterparse, every element being dropped once read unless it belongs to the
+eigenvalues. All of them may be compressed, see outcar.openFile.
+
+The files of unpolarised calculations other than OUTCAR give occupations
+between 0 and 1; they are doubled to match the ones of OUTCAR.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+from smye import outcar
+
+#: Files looked for in a calculation directory, the cheapest to read first
+CANDIDATES = ("EIGENVAL", "vasprun.xml", "OUTCAR")
+
+#: Extensions of the compressed variants of the CANDIDATES
+EXTENSIONS = ("", ".gz", ".bz2", ".xz")
+
+#: Number of bytes read to detect the format of a file
+HEAD_SIZE = 512
+
+
+def resolvePath(filePath):
+    """
+    Get the file to read for filePath, if it is a directory the first of
+    the CANDIDATES found in it, else filePath itself
+    """
+    if not os.path.isdir(filePath):
+        return filePath
+    for name in CANDIDATES:
+        for extension in EXTENSIONS:
+            path = os.path.join(filePath, name + extension)
+            if os.path.isfile(path):
+                return path
+    return filePath
+
+
+def _getConfiguration(diagram, channels):
+    """
+    Build the configuration of a diagram out of the tables of the spin
+    channels of a file.
+
+    :channels: List with the tables of every spin channel, a float array of
+               shape (bands, 3) per k-point with the columns band number,
+               energy and occupation
+    :returns: The configuration as in Diagram.getConfiguration
+
+    """
+    kpoints = list(range(1, len(channels[0]) + 1))
+    if len(channels) == 1:
+        for table in channels[0]:
+            table[:, 2] *= 2
+    if diagram.spin:
+        if len(channels) != 2:
+            diagram.vprint("There is no spin polarised information in file %s"%diagram.filePath, True)
+            sys.exit(-1)
+        configuration = {}
+        for spin, tables in zip(["1", "2"], channels):
+            with diagram._phase("tokenize") as record:
+                states = diagram._tablesToStates(kpoints, tables)
+                record.states += len(states)
+            configuration[spin] = diagram._addKeyToStates(
+                diagram._byKpoint(states), "spin", spin
+            )
+        return configuration
+    # as in OUTCAR, the states of both channels are put together
+    tables = [np.concatenate(tables) for tables in zip(*channels)]
+    with diagram._phase("tokenize") as record:
+        states = diagram._tablesToStates(kpoints, tables)
+        record.states += len(states)
+    return diagram._addKeyToStates(diagram._byKpoint(states), "spin", 0)
+
+
+class Reader(object):
+
+    """
+    Interface of the reader backends, a reader is created for every diagram.
+    The backends override accepts and read, and readFermiEnergy if their
+    files have it.
+    """
+
+    #: Name of the format
+    name = None
+
+    @staticmethod
+    def accepts(head):
+        """
+        :head: First HEAD_SIZE bytes of the file, decompressed
+        :returns: True if the file is in the format of the reader, never for
+                  this base class
+        """
+        return False
+
+    def read(self, diagram):
+        """
+        Parse the configuration of the file of a diagram.
+
+        :returns: The configuration as in Diagram.getConfiguration
+
+        """
+        raise Exception("%s can not read %s, it does not implement read"%(
+            type(self).__name__, diagram.filePath
+        ))
+
+    def readFermiEnergy(self, diagram):
+        """
+        :returns: The Fermi energy written in the file or None
+        """
+        return None
+
+
+class OutcarReader(Reader):
+
+    """
+    Reader of OUTCAR files, the format assumed when no other one matches
+    """
+
+    name = "OUTCAR"
+
+    @staticmethod
+    def accepts(head):
+        return True
+
+    def read(self, diagram):
+        return diagram._parseOutcar()
+
+    def readFermiEnergy(self, diagram):
+        if outcar.getCompression(diagram.filePath) is not None:
+            with outcar.openFile(diagram.filePath) as fd:
+                return outcar.streamFermiEnergy(fd)
+        with open(diagram.filePath, "rb") as fd:
+            return outcar.readFermiEnergy(fd)
+
+
+class EigenvalReader(Reader):
+
+    """
+    Reader of EIGENVAL files with occupations, written by VASP 5.4.4 and
+    later
+    """
+
+    name = "EIGENVAL"
+
+    @staticmethod
+    def accepts(head):
+        lines = head.split(b"\n", 4)
+        return (
+            len(lines) > 4 and len(lines[0].split()) == 4 and
+            lines[3].strip() == b"CAR"
+        )
+
+    def read(self, diagram):
+        with diagram._phase("open") as record:
+            with outcar.openFile(diagram.filePath) as fd:
+                data = fd.read()
+            record.bytes += len(data)
+        lines = data.split(b"\n", 6)
+        nspins = int(lines[0].split()[3])
+        nkpoints, nbands = [int(n) for n in lines[5].split()[1:3]]
+        with diagram._phase("tokenize") as record:
+            try:
+                values = np.array(lines[6].split(), dtype=np.float64)
+            except ValueError:
+                raise Exception("Invalid values in %s"%diagram.filePath)
+            record.bytes += len(lines[6])
+        # every k-point has its coordinates and weight and then a row per
+        # band with its number, the energies and the occupations of the spins
+        columns = (values.size//max(nkpoints, 1) - 4)//max(nbands, 1)
+        if columns != 1 + 2*nspins or values.size != nkpoints*(4 + nbands*columns):
+            raise Exception(
+                "%s has no occupations or is incomplete"%diagram.filePath
+            )
+        rows = values.reshape(nkpoints, -1)[:, 4:].reshape(nkpoints, nbands, columns)
+        channels = [
+            [
+                np.column_stack((row[:, 0], row[:, 1 + spin], row[:, 1 + nspins + spin]))
+                for row in rows
+            ]
+            for spin in range(nspins)
+        ]
+        return _getConfiguration(diagram, channels)
+
+
+class VasprunReader(Reader):
+
+    """
+    Reader of vasprun.xml files, the eigenvalues of the last calculation are
+    taken
+    """
+
+    name = "vasprun.xml"
+
+    def __init__(self):
+        self.fermiEnergy = None
+        self._read       = False
+
+    @staticmethod
+    def accepts(head):
+        head = head.lstrip()
+        return head.startswith(b"<?xml") or head.startswith(b"<modeling")
+
+    def read(self, diagram):
+        from xml.etree import ElementTree
+        channels = None
+        path     = []
+        with diagram._phase("open") as record:
+            with outcar.openFile(diagram.filePath) as fd:
+                for event, element in ElementTree.iterparse(fd, ("start", "end")):
+                    if event == "start":
+                        path.append(element.tag)
+                        continue
+                    path.pop()
+                    if element.tag == "i" and element.get("name") == "efermi":
+                        self.fermiEnergy = float(element.text)
+                    elif element.tag == "eigenvalues" and path[-1:] == ["calculation"]:
+                        channels = self._readEigenvalues(diagram, element)
+                    if "eigenvalues" not in path:
+                        element.clear()
+                record.bytes += fd.tell()
+        self._read = True
+        if not channels:
+            diagram.vprint("There are no eigenvalues in file %s"%diagram.filePath, True)
+            sys.exit(-1)
+        return _getConfiguration(diagram, channels)
+
+    def _readEigenvalues(self, diagram, element):
+        channels = []
+        # the states are counted once built, by _getConfiguration
+        with diagram._phase("tokenize"):
+            for spinSet in element.find("array").find("set").findall("set"):
+                tables = []
+                for kpointSet in spinSet.findall("set"):
+                    values = np.array(
+                        " ".join(r.text for r in kpointSet).split(),
+                        dtype=np.float64
+                    ).reshape(-1, 2)
+                    tables.append(np.column_stack(
+                        (np.arange(1, len(values) + 1), values)
+                    ))
+                channels.append(tables)
+        return channels
+
+    def readFermiEnergy(self, diagram):
+        if not self._read:
+            self.read(diagram)
+        return self.fermiEnergy
+
+
+#: Readers tried in order by getReader, the last one accepts any file
+READERS = (EigenvalReader, VasprunReader, OutcarReader)
+
+
+def getReader(filePath):
+    """
+    Get a reader for the format of a file, detected from its first bytes
+    """
+    try:
+        with outcar.openFile(filePath) as fd:
+            head = fd.read(HEAD_SIZE)
+    except Exception:
+        # the failure is reported when the file is parsed
+        head = b""
+    for reader in READERS:
+        if reader.accepts(head):
+            return reader()
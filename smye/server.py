@@ -0,0 +1,256 @@
+"""
+Long lived query server, the parsed diagrams are kept in memory so that many
+small queries on the same files only pay for the parsing once.
+
+The server listens on a Unix socket or on a TCP port of localhost and
+answers JSON queries like
+
+    {"file": "OUTCAR", "query": "getNthMostEnergeticState",
+     "args": [2], "kwargs": {"occupied": true}, "spin": true}
+
+with {"result": ...} or {"error": "..."}. The queries are sent either one
+per line on a connection, or as the body of an HTTP POST request. The files
+are parsed by a pool of processes, off the event loop, so that the other
+clients are served in the meantime.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import inspect
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+#: Methods of Diagram that can be queried
+QUERIES = (
+    "getHomo",
+    "getLumo",
+    "getNettoSpin",
+    "getNthMostEnergeticState",
+    "getNthLeastEnergeticState",
+    "getNthMostEnergeticStateWith",
+    "getNthLeastEnergeticStateWith",
+    "getStatesAboutFermiLevel",
+    "getKpointHomoLumo",
+)
+
+#: Default number of parsed diagrams kept in memory
+CACHE_SIZE = 64
+
+
+def parseConfiguration(filePath, spin=True, cache=None):
+    """
+    Parse the configuration of a file, run in the worker processes
+    """
+    from smye.smye import Diagram
+    try:
+        return Diagram(filePath, spin=spin, cache=cache).getConfiguration()
+    except SystemExit:
+        # the parser exits when it does not find the information
+        raise Exception("no electronic information found")
+
+
+def toJSON(value):
+    """
+    Convert the result of a query to something that json can serialize, the
+    states become dictionaries
+    """
+    import numpy as np
+    if isinstance(value, np.ndarray):
+        if value.dtype.names:
+            return [toJSON(v) for v in value]
+        return value.tolist()
+    if isinstance(value, np.void):
+        return dict(zip(value.dtype.names, value.tolist()))
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (tuple, list)):
+        return [toJSON(v) for v in value]
+    return value
+
+
+class Server(object):
+
+    """
+    Server of queries on diagrams, with a least recently used cache of the
+    parsed diagrams.
+    """
+
+    def __init__(self, cacheSize=CACHE_SIZE, workers=None, cache=None):
+        """
+        :cacheSize: Number of parsed diagrams kept in memory
+        :workers: Number of processes parsing the files
+        :cache: Optional smye.cache.ParseCache used by the workers
+        """
+        self.cacheSize = cacheSize
+        self.cache     = cache
+        self.pool      = ProcessPoolExecutor(workers or os.cpu_count())
+        self._diagrams = collections.OrderedDict()
+
+    async def getDiagram(self, filePath, spin=True):
+        """
+        Get the parsed diagram of a file, the file is parsed again if it
+        changed since it was parsed. Concurrent requests of the same file wait
+        for the same parsing.
+        """
+        stat = os.stat(filePath)
+        key  = (os.path.abspath(filePath), bool(spin), stat.st_size, stat.st_mtime)
+        if key in self._diagrams:
+            self._diagrams.move_to_end(key)
+        else:
+            self._diagrams[key] = asyncio.ensure_future(self._load(filePath, spin))
+            while len(self._diagrams) > self.cacheSize:
+                self._diagrams.popitem(last=False)
+        future = self._diagrams[key]
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            if self._diagrams.get(key) is future:
+                del self._diagrams[key]
+            raise
+
+    async def _load(self, filePath, spin):
+        from smye.smye import Diagram
+        loop = asyncio.get_running_loop()
+        configuration = await loop.run_in_executor(
+            self.pool, parseConfiguration, filePath, spin, self.cache
+        )
+        diagram = Diagram(filePath, spin=spin)
+        diagram._setConfiguration(configuration)
+        return diagram
+
+    async def answer(self, request):
+        """
+        Answer a query.
+
+        :request: Dictionary with the keys file, query and optionally args,
+                  kwargs and spin
+        :returns: Dictionary with the key result or error
+
+        """
+        try:
+            query = request["query"]
+            if query not in QUERIES:
+                raise Exception("Unknown query %s"%query)
+            diagram = await self.getDiagram(
+                request["file"], request.get("spin", True)
+            )
+            method    = getattr(diagram, query)
+            arguments = inspect.signature(method).bind(
+                *request.get("args", []), **request.get("kwargs", {})
+            )
+            arguments.apply_defaults()
+            # the queries exit on invalid spins, which would stop the server
+            spin = arguments.arguments.get("spin")
+            if diagram.spin and "spin" in arguments.arguments and spin not in ["1", "2"]:
+                raise Exception(
+                    "%s needs spin \"1\" or \"2\" for spin polarised files"%query
+                )
+            result = method(*arguments.args, **arguments.kwargs)
+            return {"result": toJSON(result)}
+        except KeyError as e:
+            return {"error": "Missing key %s"%e}
+        except SystemExit:
+            return {"error": "Invalid query %s"%request.get("query")}
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def _answerLine(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {"error": "Invalid JSON: %s"%e}
+        if not isinstance(request, dict):
+            return {"error": "The query must be a JSON object"}
+        return await self.answer(request)
+
+    async def handle(self, reader, writer):
+        """
+        Serve a connection, either JSON lines or a single HTTP request
+        """
+        try:
+            line = await reader.readline()
+            if line.startswith((b"POST ", b"GET ")):
+                await self._handleHTTP(line, reader, writer)
+                return
+            while line:
+                if line.strip():
+                    response = await self._answerLine(line)
+                    writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                    await writer.drain()
+                line = await reader.readline()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handleHTTP(self, requestLine, reader, writer):
+        length = "0"
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = value.strip()
+        if requestLine.startswith(b"POST "):
+            try:
+                body = await reader.readexactly(int(length))
+            except ValueError:
+                response = {"error": "Invalid Content-Length %s"%length}
+            except asyncio.IncompleteReadError as e:
+                response = {"error": "Incomplete body, got %s of %s bytes"%(
+                    len(e.partial), e.expected
+                )}
+            else:
+                response = await self._answerLine(body)
+            status = "400 Bad Request" if "error" in response else "200 OK"
+        else:
+            response = {"queries": list(QUERIES)}
+            status = "200 OK"
+        body = json.dumps(response).encode("utf-8")
+        writer.write((
+            "HTTP/1.1 %s\r\nContent-Type: application/json\r\n"
+            "Content-Length: %s\r\nConnection: close\r\n\r\n"%(status, len(body))
+        ).encode("latin-1") + body)
+        await writer.drain()
+
+    async def start(self, socketPath=None, host="127.0.0.1", port=8765):
+        """
+        Start listening on the Unix socket socketPath, or on host:port
+        """
+        # fork the workers before accepting any connection, so that they do
+        # not inherit the sockets of the clients
+        await asyncio.get_running_loop().run_in_executor(self.pool, int)
+        if socketPath:
+            return await asyncio.start_unix_server(self.handle, path=socketPath)
+        return await asyncio.start_server(self.handle, host=host, port=port)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def serve(socketPath=None, host="127.0.0.1", port=8765, cacheSize=CACHE_SIZE,
+        workers=None, cache=None, err=sys.stderr):
+    """
+    Run the server until it is interrupted, see Server for the arguments
+    """
+    server = Server(cacheSize=cacheSize, workers=workers, cache=cache)
+
+    async def main():
+        listener = await server.start(socketPath, host, port)
+        err.write("Serving on %s\n"%(
+            socketPath or "http://%s:%s"%(host, port)
+        ))
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if socketPath and os.path.exists(socketPath):
+            os.remove(socketPath)
@@ -1,7 +1,24 @@
-import os, sys
+import os, sys, mmap, time, contextlib
+import numpy as np
+from smye import outcar, readers
+from smye.instrument import NULL_RECORD, profiled
 
 VERBOSE=False
 
+#: Record type of a single state, the configuration of every spin is stored as
+#: an array of these records
+STATE_DTYPE = np.dtype([
+    ("number", np.int64),
+    ("energy", np.float64),
+    ("occupation", np.float64),
+    ("spin", np.int8),
+    ("kpoint", np.int32)
+])
+
+#: Number of byte ranges per worker in the parallel scan of the trajectory,
+#: more ranges than workers even out the ranges with fewer blocks
+RANGES_PER_WORKER = 4
+
 class Diagram(object):
 
     """
@@ -9,46 +26,150 @@ class Diagram(object):
     to extract information of the electronic configuration stored in the class.
 
     It needs to be given upon initializazion a file to read the electronic
-    structure from. At the moment it assumes that the format of the file is in
-    the OUTCAR form of the VASP program.
+    structure from, an OUTCAR, EIGENVAL or vasprun.xml file of the VASP
+    program, or a calculation directory, where the cheapest of them is read.
+    The format is detected by smye.readers.getReader.
+
+    By default only the last eigenvalue block of OUTCAR files is read,
+    scanning the file backwards from its end (reverse=True). With
+    reverse=False the whole file is read into memory and parsed.
+
+    If a cache (see smye.cache.ParseCache) is given, the parsed configuration
+    is stored in it and loaded from it the next time the same unchanged file
+    is used.
+
+    If a profiler (see smye.instrument.Profiler) is given, the time, bytes and
+    states of the phases of the parsing and of the queries are recorded in it.
+
+    With workers > 1 the trajectory is read by that many processes, each one
+    scanning a byte range of the file, see getTrajectory.
     """
 
-    def __init__(self, filePath, verbose=VERBOSE, spin=True):
+    def __init__(self, filePath, verbose=VERBOSE, spin=True, reverse=True,
+            cache=None, profiler=None, workers=1):
 
-        self.filePath       = filePath
+        self.filePath       = readers.resolvePath(filePath)
         self.verbose        = verbose
         self.spin           = spin
+        self.reverse        = reverse
+        self.cache          = cache
+        self.profiler       = profiler
+        self.workers        = workers
         self._configuration = None
+        self._index         = None
+        self._reader        = None
+        self._states        = None
+        self._selections    = {}
+        self._energyIndex   = {}
+        self._sortedStates  = {}
+        self._fermiEnergy   = None
+        self._scanner       = None
+        self._trajectory    = None
+        #: Offset up to which the file has been consumed by follow
+        self.offset         = 0
+        #: Number of blocks parsed by follow
+        self.steps          = 0
 
-    def vprint(self, something, err=False, title="Diagram"):
+    def vprint(self, something, err=False, title="Diagram", args=()):
+        """
+        Print something if verbose, the format args are only applied then
+        """
         if self.verbose:
+            if args:
+                something = something%args
             if not err :
                 print("%s:: %s"%(title, something))
             else:
                 raise Exception("Diagram::ERROR:: %s"%something)
 
+    def _phase(self, name):
+        """
+        Context manager measuring a phase with the profiler, if any
+        """
+        if self.profiler is None:
+            return contextlib.nullcontext(NULL_RECORD)
+        return self.profiler.phase(name)
+
+    def getReader(self):
+        """
+        Get the reader backend of the file, see smye.readers
+        """
+        if self._reader is None:
+            self._reader = readers.getReader(self.filePath)
+            self.vprint("Reading %s as %s", args=(self.filePath, self._reader.name))
+        return self._reader
+
+    def _checkOutcar(self, feature):
+        if not isinstance(self.getReader(), readers.OutcarReader):
+            raise Exception("%s needs an OUTCAR file, %s is read as %s"%(
+                feature, self.filePath, self.getReader().name
+            ))
+
     def _parseFile(self):
         """
         This function parses the electronic configuration of the filePath
         """
+        return self.getReader().read(self)
+
+    def _parseOutcar(self):
+        """
+        Parse the electronic configuration of the filePath in OUTCAR format
+        """
         try:
-            self.vprint("Trying to open file %s"%self.filePath)
-            fd = open(self.filePath,"r")
-        except IOError, e:
+            self.vprint("Trying to open file %s", args=(self.filePath,))
+            with self._phase("open") as record:
+                fd = open(self.filePath,"rb")
+                # only the magic bytes are read to open the file
+                record.bytes += min(outcar.MAGIC_SIZE, os.fstat(fd.fileno()).st_size)
+                opener = outcar.getCompression(self.filePath)
+        except IOError as e:
             self.vprint("File %s could not be opened"%self.filePath, True)
             raise IOError(e)
         else:
-            self.vprint("Reading file")
-            fileBuffer = fd.read()
-            self.vprint("\033[0;31mWARNING:\033[0m ONLY WORKS FOR ONE K-POINT")
-            if self.spin:
-                return self._parseWithSpin(fileBuffer)
-            else:
-                return self._parseWithoutSpin(fileBuffer)
+            try:
+                if opener is not None:
+                    # compressed files can not be read backwards nor mapped,
+                    # they are decompressed as a stream keeping only the last
+                    # complete block
+                    with self._phase("locate") as record:
+                        self.vprint("Decompressing file while scanning for the last block")
+                        with opener(fd, "rb") as stream:
+                            fileBuffer = outcar.streamLastBlock(stream, self.spin)
+                        record.bytes += len(fileBuffer)
+                    return self._parseBuffer(fileBuffer)
+                if self.reverse:
+                    with self._phase("locate") as record:
+                        self.vprint("Scanning file backwards for the last block")
+                        fileBuffer = outcar.readLastBlock(fd, self.spin)
+                        record.bytes += len(fileBuffer)
+                    return self._parseBuffer(fileBuffer)
+                self.vprint("Mapping file")
+                try:
+                    fileBuffer = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    # empty files can not be mapped
+                    fileBuffer = b""
+                try:
+                    return self._parseBuffer(fileBuffer)
+                finally:
+                    if isinstance(fileBuffer, mmap.mmap):
+                        fileBuffer.close()
+            finally:
+                fd.close()
+
+    def _parseBuffer(self, fileBuffer):
+        """
+        Parse the last eigenvalue block contained in fileBuffer, bytes or a
+        memory map. The block is located by its offsets and only its tables
+        are copied out of the buffer.
+        """
+        if self.spin:
+            return self._parseWithSpin(fileBuffer)
+        else:
+            return self._parseWithoutSpin(fileBuffer)
 
     def _addKeyToStates(self, states, key, value):
-        for state in states:
-            state[key]=value
+        states[key]=int(value)
         return states
 
     def _parseWithoutSpin(self, fileBuffer):
@@ -59,46 +180,56 @@ class Diagram(object):
         :returns: TODO
 
         """
-        occupation = [];
+        occupation = np.zeros(0, dtype=STATE_DTYPE);
         self.vprint("Parsing electronic configuration without spin");
-        identificationString="  band No.  band energies     occupation ";
-        downSeparator="-------";
-        occupationBuffer = fileBuffer.split(identificationString);
-        if len(occupationBuffer)==1:
-            self.vprint("There is no '%s' part in file %s, I AM NOT ABLE TO FIND ELECTRONIC INFORMATION"%(identificationString, self.filePath), True)
+        identificationString=outcar.BAND_HEADER;
+        downSeparator=b"-------";
+        lastTable = fileBuffer.rfind(identificationString);
+        if lastTable==-1:
+            self.vprint("There is no '%s' part in file %s, I AM NOT ABLE TO FIND ELECTRONIC INFORMATION"%(identificationString.decode(), self.filePath), True)
             sys.exit(1)
         else:
-            lastOccupationBuffer        = occupationBuffer[-1]
-            lastOccupationBufferCleaned = lastOccupationBuffer.split(downSeparator)
-            if len(lastOccupationBufferCleaned)==1:
+            # the tables of all k-points follow the last E-fermi line
+            start = fileBuffer.rfind(b"E-fermi", 0, lastTable)
+            start = lastTable if start == -1 else fileBuffer.find(b"\n", start)
+            end   = fileBuffer.find(downSeparator, lastTable)
+            if end==-1:
                 self.vprint("There was a problem parsing the information ", True)
             else:
-                occupation=self._parseElectronicConfiguration(lastOccupationBufferCleaned[0])
+                occupation=self._byKpoint(
+                    self._parseElectronicConfiguration(fileBuffer[start:end])
+                )
         # we add a key to all states for completeness for the case with spin polarisation
         return self._addKeyToStates(occupation, "spin", 0)
 
     def _parseWithSpin(self, fileBuffer):
-        spinOccupation = {"1":[], "2":[]}
-        separator      = {"1":"spin component 2", "2":"-----"}
+        spinOccupation = {
+            "1":np.zeros(0, dtype=STATE_DTYPE),
+            "2":np.zeros(0, dtype=STATE_DTYPE)
+        }
+        separator      = {"1":b"spin component 2", "2":b"-----"}
         for spin in ["1","2"]:
-            self.vprint("Parsing information for spin %s"%spin)
+            self.vprint("Parsing information for spin %s", args=(spin,))
             # The separators tell you up until which characters the spin part goes
             # For spin component 1, the information goes until the text spin component 2 is found
             # For spin component 2, the information goes until the ------ line is found
-            spinBuffer = fileBuffer.split("spin component %s"%spin)
-            if len(spinBuffer)==1:
+            marker = b"spin component %s"%spin.encode()
+            start  = fileBuffer.rfind(marker)
+            if start==-1:
                 self.vprint("There is no 'spin component %s' part in file %s"%(spin, self.filePath), True)
                 sys.exit(-1)
             else:
-                lastSpinBuffer        = spinBuffer[-1]
-                lastSpinBufferCleaned = lastSpinBuffer.split(separator[spin])
-                if len(lastSpinBufferCleaned)==1:
+                start += len(marker)
+                end    = fileBuffer.find(separator[spin], start)
+                if end==-1:
                     self.vprint("There was a problem parsing the information for spin %s"%(spin), True)
                 else:
-                    preOccupation = self._parseElectronicConfiguration(lastSpinBufferCleaned[0])
+                    preOccupation = self._byKpoint(
+                        self._parseElectronicConfiguration(fileBuffer[start:end])
+                    )
                     # we add a key to all states to be able to differentiate between spins
                     spinOccupation[spin]=self._addKeyToStates(preOccupation, "spin", spin)
-                    self.vprint("[   \033[0;31mOK\033[0m   ] Information for spin %s parsed"%spin)
+                    self.vprint("[   \033[0;31mOK\033[0m   ] Information for spin %s parsed", args=(spin,))
         return spinOccupation
 
     def _parseElectronicConfiguration(self, string):
@@ -110,46 +241,159 @@ class Diagram(object):
 
          | electron_number | electron_energy | electron_occupation |
 
+        Several tables may follow each other, each one preceded by its
+        k-point line and header. The states are returned as an array of
+        STATE_DTYPE records.
         """
 
-        import re
-        result      = []
-        p           = re.compile("(\-?\d+\.?\d*)\s+(\-?\d+\.?\d*)\s+(\-?\d+\.?\d*)")
-        stringLines = string.split("\n")
-        for line in stringLines:
-            match = p.findall(line)
-            if match:
-                if "k-point" in line:
-                    # fix for k-point appearing in OUTCAR
-                    self.vprint("\tignoring line with k-point")
-                    continue
-                if len(match) == 1:
-                    niveau = match[0]
-                    result.append({"number": niveau[0], "energy":niveau[1], "occupation":niveau[2]})
-                else:
-                    break
-        return result
-
-    def _findTheNthExtremalEnergeticState(self, n, states, extreme):
-        self.vprint("Finding the (%s)th extreme (%s)"%(n, extreme))
-        popIndex = -1
-        bottle = None
-        for i in range(n):
-            bottle = states[-1]
-            for j, state in enumerate(states):
-                if extreme == "least":
-                    if self._geq(bottle, state):
-                        # self.vprint(bottle)
-                        bottle=state
-                        popIndex=j
-                else:
-                    if self._geq(state, bottle):
-                        # self.vprint(bottle)
-                        bottle=state
-                        popIndex=j
-            # erase maximum from the list
-            states.pop(popIndex)
-        return bottle
+        with self._phase("tokenize") as record:
+            kpoints, tables = outcar.tokenizeTables(string)
+            states = self._tablesToStates(kpoints, tables)
+            record.bytes  += len(string)
+            record.states += len(states)
+        return states
+
+    def _tablesToStates(self, kpoints, tables):
+        """
+        Build the array of states out of the tables given by
+        outcar.tokenizeTables
+        """
+        states = np.zeros(sum(len(table) for table in tables), dtype=STATE_DTYPE)
+        if len(states):
+            values = np.concatenate(tables)
+            states["number"]     = values[:, 0]
+            states["energy"]     = values[:, 1]
+            states["occupation"] = values[:, 2]
+            states["kpoint"]     = np.repeat(kpoints, [len(t) for t in tables])
+        return states
+
+    def _byKpoint(self, states):
+        """
+        Arrange the states of a spin channel in a (kpoint, band) grid, the
+        states of a k-point keep their order, e.g. both spin channels of a
+        polarised file parsed without spin
+        """
+        nkpoints = max(len(np.unique(states["kpoint"])), 1)
+        states = states[np.argsort(states["kpoint"], kind="stable")]
+        return states.reshape(nkpoints, -1)
+
+    def _getStates(self):
+        """
+        Get the configuration of all spin channels stacked in an array of
+        shape (spin, kpoint, band), the spin channels of getConfiguration are
+        views into it
+        """
+        if self._states is None:
+            self._states = self._stackSpins(self.getConfiguration())
+        return self._states
+
+    def _stackSpins(self, configuration):
+        if self.spin:
+            return np.stack((configuration["1"], configuration["2"]))
+        else:
+            return configuration[np.newaxis]
+
+    def getEnergies(self):
+        """
+        :returns: Energies of all states with shape (spin, kpoint, band)
+        """
+        return self._getStates()["energy"]
+
+    def getOccupations(self):
+        """
+        :returns: Occupations of all states with shape (spin, kpoint, band)
+        """
+        return self._getStates()["occupation"]
+
+    @profiled("query")
+    def getKpointHomoLumo(self):
+        """
+        Get the energies of the highest occupied and lowest unoccupied states
+        at every k-point, taking both spin channels together.
+
+        :returns: Tuple of arrays (homo, lumo) of length the number of k-points
+        """
+        states   = self._getStates()
+        energies = states["energy"]
+        occupied = states["occupation"] != 0
+        homo = np.where(occupied, energies, -np.inf).max(axis=(0, 2))
+        lumo = np.where(occupied, np.inf, energies).min(axis=(0, 2))
+        return homo, lumo
+
+    def _getEnergyIndex(self, spin):
+        """
+        Get the states of a spin channel sorted by increasing energy, states
+        with equal energies in the order in which they appear. If spin is None
+        the states of both channels are taken together.
+
+        The index is built only once, it backs both the selection of states
+        by rank and by energy window.
+
+        :returns: Tuple (states, energies) of read-only arrays
+        """
+        if not self.spin:
+            spin = -1
+        elif spin is not None and not spin in ["1","2"]:
+            print("Spin must be either 1 or 2")
+            sys.exit(1)
+        if spin not in self._energyIndex:
+            configuration = self.getConfiguration()
+            if spin is None:
+                states = np.concatenate(
+                    (configuration["1"].ravel(), configuration["2"].ravel())
+                )
+            elif self.spin:
+                states = configuration[spin].ravel()
+            else:
+                states = configuration.ravel()
+            with self._phase("sort") as record:
+                self.vprint("Sorting %s states by energy", args=(len(states),))
+                states   = states[np.argsort(states["energy"], kind="stable")]
+                energies = np.ascontiguousarray(states["energy"])
+                states.flags.writeable = energies.flags.writeable = False
+                record.states += len(states)
+            self._energyIndex[spin] = (states, energies)
+        return self._energyIndex[spin]
+
+    def _reverseTies(self, energies):
+        """
+        Get the permutation that reverses the order of every run of equal
+        values in the sorted array energies
+        """
+        boundary = np.ones(len(energies), dtype=bool)
+        boundary[1:] = energies[1:] != energies[:-1]
+        starts = np.flatnonzero(boundary)
+        ends   = np.append(starts[1:], len(energies))
+        group  = np.cumsum(boundary) - 1
+        return starts[group] + ends[group] - 1 - np.arange(len(energies))
+
+    def _getSortedStates(self, spin, occupied, extreme):
+        """
+        Get the occupied or unoccupied states of a spin channel sorted
+        starting from the most extreme one, among states with equal energies
+        the one appearing last comes first. If spin is None the states of
+        both channels are taken together.
+
+        The states are taken from the energy index, so that the nth extremal
+        state is just an index into the result.
+        """
+        key = (spin, occupied, extreme)
+        if key not in self._sortedStates:
+            states = self._getEnergyIndex(spin)[0]
+            isOccupied = states["occupation"] != 0
+            states = states[isOccupied if occupied else ~isOccupied]
+            if extreme == "most":
+                states = states[::-1]
+            else:
+                states = states[self._reverseTies(states["energy"])]
+            self._sortedStates[key] = states
+        return self._sortedStates[key]
+
+    def _findTheNthExtremalEnergeticState(self, n, spin, occupied, extreme):
+        self.vprint("Finding the (%s)th extreme (%s)", args=(n, extreme))
+        if n < 1:
+            return None
+        return self._getSortedStates(spin, occupied, extreme)[n-1]
 
     def getConfigurationWith(self, spin=-1, occupied=True):
         """
@@ -159,24 +403,26 @@ class Diagram(object):
             Spin must be 1 or 2 if being calculating with
             spin polarisation
 
-        Returns a list of states
+        Returns an array of states, the selection is done only once and the
+        same read-only array is returned afterwards
         """
-        states = []
         if self.spin:
             if not spin in ["1","2"]:
                 print("Spin must be either 1 or 2")
                 sys.exit(1)
-            configuration = self.getConfiguration()[spin]
         else:
-            configuration = self.getConfiguration()
-        for state in configuration:
-            if occupied:
-                if float(state["occupation"]):
-                    states.append(state)
+            spin = -1
+        key = (spin, bool(occupied))
+        if key not in self._selections:
+            if self.spin:
+                configuration = self.getConfiguration()[spin]
             else:
-                if not float(state["occupation"]):
-                    states.append(state)
-        return states
+                configuration = self.getConfiguration()
+            isOccupied = configuration["occupation"] != 0
+            states = configuration[isOccupied if occupied else ~isOccupied]
+            states.flags.writeable = False
+            self._selections[key] = states
+        return self._selections[key]
 
     def getUnoccupiedStates(self, spin=-1):
         self.vprint("Getting \033[0;36munoccupied\033[0m states")
@@ -186,19 +432,17 @@ class Diagram(object):
         self.vprint("Getting \033[0;36moccupied\033[0m states")
         return self.getConfigurationWith(spin, occupied=True)
 
+    @profiled("query")
     def getStatesAboutFermiLevel(self, down_offset, up_offset):
-        states = []
+        spin = None if self.spin else -1
         # unoccupied states
-        for i in range(up_offset, 0, -1):
-            state = self.getNthLeastEnergeticState(i, occupied=False)
-            states.append(state)
+        unoccupied = self._getSortedStates(spin, False, "least")[:up_offset]
         # occupied states
-        for i in range(1,down_offset+1):
-            state = self.getNthMostEnergeticState(i, occupied=True)
-            states.append(state)
-        return states
+        occupied = self._getSortedStates(spin, True, "most")[:down_offset]
+        return np.concatenate((unoccupied[::-1], occupied))
 
 
+    @profiled("query")
     def getNthLeastEnergeticStateWith(self, n, spin=-1, occupied=True):
         """
         This is together with getNthMostEnergeticStateWith one of the main
@@ -206,31 +450,26 @@ class Diagram(object):
 
         Get the nth least energetic state of occupied or unoccupied states
             e.g.: 1 = least energetic usw..
-        We make n loops finding the most energetic occupied states and taking
-        them out of the list
+        The states are sorted once by energy and the nth one is looked up
         """
-        self.vprint("Getting the %sth least energetic state with spin=%s"%(n, spin))
-        states = self.getConfigurationWith(spin, occupied)
-        return self._findTheNthExtremalEnergeticState(n, states, "least")
+        self.vprint("Getting the %sth least energetic state with spin=%s", args=(n, spin))
+        return self._findTheNthExtremalEnergeticState(n, spin, occupied, "least")
 
+    @profiled("query")
     def getNthMostEnergeticStateWith(self, n, spin=-1, occupied=True):
         """
         Get the nth most energetic state of occupied or unoccupied states
             e.g.: 1 = most energetic usw..
-        We make n loops finding the most energetic occupied states and taking
-        them out of the list
+        The states are sorted once by energy and the nth one is looked up
         """
-        self.vprint("Getting the %sth least energetic state with spin=%s"%(n, spin))
-        states = self.getConfigurationWith(spin, occupied)
-        return self._findTheNthExtremalEnergeticState(n, states, "most")
+        self.vprint("Getting the %sth most energetic state with spin=%s", args=(n, spin))
+        return self._findTheNthExtremalEnergeticState(n, spin, occupied, "most")
 
+    @profiled("query")
     def getNthExtremalEnergeticState(self, n, extreme, occupied=True):
-        self.vprint("Getting the %sth %s energetic state with regardless of spin for occupied = %s"%(n, extreme, occupied))
+        self.vprint("Getting the %sth %s energetic state with regardless of spin for occupied = %s", args=(n, extreme, occupied))
         if self.spin:
-            spin1_states = self.getConfigurationWith(spin="1", occupied=occupied)
-            spin2_states = self.getConfigurationWith(spin="2", occupied=occupied)
-            all_states = spin1_states + spin2_states
-            return self._findTheNthExtremalEnergeticState(n, all_states, extreme)
+            return self._findTheNthExtremalEnergeticState(n, None, occupied, extreme)
         else:
             if extreme=="least":
                 return self.getNthLeastEnergeticStateWith(n, spin=-1, occupied=occupied)
@@ -247,19 +486,13 @@ class Diagram(object):
         """
         Compares the energy of two states
         """
-        if float(state1["energy"])<=float(state2["energy"]):
-            return True
-        else:
-            return False
+        return state1["energy"]<=state2["energy"]
 
     def _geq(self, state1, state2):
         """
         Compares the energy of two states
         """
-        if float(state1["energy"])>=float(state2["energy"]):
-            return True
-        else:
-            return False
+        return state1["energy"]>=state2["energy"]
 
 
     def printNthExcitedState(self, nArray):
@@ -268,60 +501,205 @@ class Diagram(object):
                 state = self.getNthLeastEnergeticState(abs(n), occupied=False)
             else:
                 state = self.getNthMostEnergeticState(n,occupied=True)
-            print(state)
+            print(self._formatState(state))
 
     def printStatesAboutFermiLevel(self, down_offset, up_offset=0):
         states = self.getStatesAboutFermiLevel(down_offset, up_offset)
         print("%s %s %s %s"%("spin", "energy", "occupation", "number"))
         for state in states:
             # print state
-            print("%s %s %s %s"%(state["spin"], state["energy"], state["occupation"], state["number"]))
+            print("%s %.4f %.5f %s"%(state["spin"], state["energy"], state["occupation"], state["number"]))
 
     def getHomo(self):
         self.vprint("Getting \033[0;36mHOMO\033[0m")
         return self.getNthMostEnergeticState(1, occupied=True)
 
+    @profiled("query")
     def getNettoSpin(self):
         """
         This sums the spin numbers of the array states
-        and gives the netto spin of the system.
+        and gives the netto spin of the system. With several k-points these
+        are taken to be equally weighted.
 
         :states: Array of states
         :returns: Spin
 
         """
-        SPIN_1=0
-        SPIN_2=0
         if not self.spin:
             raise Exception("To get the spin a polarised calcultion must be performed")
         self.vprint("Calculating netto spin")
         spin1=self.getOccupiedStates(spin="1")
         spin2=self.getOccupiedStates(spin="2")
-        for state in spin1:
-            SPIN_1+=float(state["occupation"])
-        for state in spin2:
-            SPIN_2+=float(state["occupation"])
+        nkpoints=len(self.getConfiguration()["1"])
+        SPIN_1=spin1["occupation"].sum()/nkpoints
+        SPIN_2=spin2["occupation"].sum()/nkpoints
         return abs(SPIN_1-SPIN_2)/2
     def getLumo(self):
         self.vprint("Getting \033[0;36mLUMO\033[0m")
         return self.getNthLeastEnergeticState(1, occupied=False)
 
+    @profiled("query")
     def getBandGap(self):
         """
         Gets the bandgap out of the electronic configuration
+
+        With several k-points the k-points of the valence band maximum and
+        the conduction band minimum are also given, together with the
+        smallest direct gap.
         """
         self.vprint("Getting bandgap information");
         valence = self.getHomo()
         conduction = self.getLumo()
 
-        bandgap = float(conduction["energy"]) - float(valence["energy"])
+        bandgap = conduction["energy"] - valence["energy"]
         print("VB %s"%valence["energy"])
         print("LB %s"%conduction["energy"])
         print("BG %s"%(bandgap))
-        print("HOMO %s"%(valence))
-        print("LUMO %s"%(conduction))
+        print("HOMO %s"%self._formatState(valence))
+        print("LUMO %s"%self._formatState(conduction))
+        homo, lumo = self.getKpointHomoLumo()
+        if len(homo) > 1:
+            direct = np.argmin(lumo - homo)
+            print("VB-K %s"%valence["kpoint"])
+            print("LB-K %s"%conduction["kpoint"])
+            print("DBG %s"%(lumo[direct] - homo[direct]))
+            print("DBG-K %s"%self._getStates()[0, direct, 0]["kpoint"])
         return bandgap
 
+    @profiled("query")
+    def getStatesInWindow(self, emin, emax, spin=None, relative=False):
+        """
+        Get all the states with energies between emin and emax, both
+        included. They are found by binary search in the energy index, so
+        that the cost grows only with the logarithm of the number of states
+        plus the number of states in the window.
+
+        :spin: Spin channel "1" or "2", by default both channels
+        :relative: The energies are relative to the Fermi energy
+        :returns: Read-only array of states sorted by increasing energy
+
+        """
+        if relative:
+            fermi = self.getFermiEnergy()
+            emin, emax = emin + fermi, emax + fermi
+        states, energies = self._getEnergyIndex(spin)
+        start = np.searchsorted(energies, emin, side="left")
+        end   = np.searchsorted(energies, emax, side="right")
+        return states[start:end]
+
+    def printStatesInWindow(self, emin, emax, spin=None, relative=False):
+        states = self.getStatesInWindow(emin, emax, spin, relative)
+        print("%s %s %s %s"%("spin", "energy", "occupation", "number"))
+        for state in states[::-1]:
+            print("%s %.4f %.5f %s"%(state["spin"], state["energy"], state["occupation"], state["number"]))
+
+    def getFermiEnergy(self):
+        """
+        Get the Fermi energy written in the file, the last E-fermi line of
+        OUTCAR files, if there is none the middle of the gap between HOMO and
+        LUMO is taken
+        """
+        if self._fermiEnergy is None:
+            self._fermiEnergy = self.getReader().readFermiEnergy(self)
+            if self._fermiEnergy is None:
+                self.vprint("No E-fermi line found, taking the middle of the gap")
+                self._fermiEnergy = 0.5*(
+                    self.getHomo()["energy"] + self.getLumo()["energy"]
+                )
+        return self._fermiEnergy
+
+    @profiled("query")
+    def getDOS(self, grid=None, sigma=0.1, points=1000, kpointWeights=None,
+            occupation=False):
+        """
+        Get the Gaussian smeared density of states of every spin channel, see
+        smye.dos.getDOS
+
+        :grid: Energies at which the DOS is evaluated, by default a uniform
+               grid of points energies covering all the levels
+        :sigma: Standard deviation of the Gaussian smearing
+        :kpointWeights: Weights of the k-points, by default all equal
+        :occupation: Weight every level with its occupation
+        :returns: Tuple (grid, dos) with dos of shape (spin, len(grid))
+        """
+        from smye import dos
+        states = self._getStates()
+        if grid is None:
+            grid = dos.getGrid(states["energy"], sigma, points)
+        return grid, dos.getDOS(
+            states, grid, sigma, kpointWeights=kpointWeights,
+            occupation=occupation
+        )
+
+    def printDOS(self, *args, **kwargs):
+        """
+        Print the density of states of getDOS, one energy per line with a
+        column per spin channel
+        """
+        grid, dos = self.getDOS(*args, **kwargs)
+        if self.spin:
+            print("energy DOS-1 DOS-2")
+        else:
+            print("energy DOS")
+        for energy, values in zip(grid, dos.T):
+            print(" ".join(["%.4f"%energy] + ["%.6f"%value for value in values]))
+
+    @profiled("query")
+    def getTransitions(self, emax=None, top=None, emin=None, kind="conserving",
+            vertical=True):
+        """
+        Get the transitions from occupied to unoccupied states, see
+        smye.transitions.getTransitions
+
+        :emax: Highest energy of the transitions
+        :top: Get only the top transitions of lowest energy
+        :emin: Lowest energy of the transitions
+        :kind: "conserving" for transitions within a spin channel, "flip" for
+               transitions between the spin channels or "all" for both
+        :vertical: Only transitions between states of the same k-point
+        :returns: Array of smye.transitions.TRANSITION_DTYPE sorted by
+                  increasing energy
+
+        """
+        from smye import transitions
+        if kind not in transitions.KINDS:
+            raise Exception("The kind of transitions must be one of %s"%", ".join(transitions.KINDS))
+        states = self._getStates()
+        if kind != "conserving" and len(states) != 2:
+            raise Exception("Spin-flip transitions need a spin polarised file")
+        channels = []
+        if kind != "flip":
+            channels += [(spin, spin) for spin in range(len(states))]
+        if kind != "conserving":
+            channels += [(0, 1), (1, 0)]
+        occupied = states["occupation"] != 0
+        groups   = []
+        for initial, final in channels:
+            if vertical:
+                groups += [
+                    (states[initial, k][occupied[initial, k]],
+                        states[final, k][~occupied[final, k]])
+                    for k in range(states.shape[1])
+                ]
+            else:
+                groups.append(
+                    (states[initial][occupied[initial]], states[final][~occupied[final]])
+                )
+        return transitions.getTransitions(groups, emin, emax, top)
+
+    def printTransitions(self, *args, **kwargs):
+        """
+        Print the transitions of getTransitions, one per line with the spin,
+        k-point and band number of the initial and final states
+        """
+        print("energy initial-spin initial-kpoint initial-number final-spin final-kpoint final-number")
+        for transition in self.getTransitions(*args, **kwargs):
+            initial, final = transition["initial"], transition["final"]
+            print("%.4f %s %s %s %s %s %s"%(
+                transition["energy"], initial["spin"], initial["kpoint"],
+                initial["number"], final["spin"], final["kpoint"], final["number"]
+            ))
+
     def getConfiguration(self):
 
         """
@@ -330,31 +708,289 @@ class Diagram(object):
         previously parsed configuration
         """
 
-        if not self._configuration:
+        if self._configuration is None and self.cache is not None:
+            self.vprint("Looking for the configuration in the cache")
+            with self._phase("cache"):
+                configuration = self.cache.load(self.filePath, self.spin)
+            if configuration is not None:
+                self._setConfiguration(configuration)
+        if self._configuration is None:
             self.vprint("Going to get configuration from file")
-            self._configuration = self._parseFile()
+            self._setConfiguration(self._parseFile())
+            if self.cache is not None:
+                self.vprint("Storing the configuration in the cache")
+                with self._phase("cache"):
+                    self.cache.store(self.filePath, self._configuration, self.spin)
         return self._configuration
 
+    def _setConfiguration(self, configuration):
+        """
+        Replace the configuration, forgetting everything derived from the
+        previous one. The spin channels are stacked in a single array and
+        replaced by views into it, so that nothing is copied afterwards
+        """
+        self._states        = None
+        self._selections    = {}
+        self._energyIndex   = {}
+        self._sortedStates  = {}
+        self._fermiEnergy   = None
+        if self.spin and configuration["1"].shape == configuration["2"].shape:
+            self._states  = self._stackSpins(configuration)
+            configuration = {"1": self._states[0], "2": self._states[1]}
+        self._configuration = configuration
+
+    def follow(self, interval=1.0, idle=None):
+        """
+        Follow the file while it is being written, parsing only the eigenvalue
+        blocks appended to it. Every time a new block is complete it becomes
+        the configuration of the diagram and the number of blocks parsed so
+        far is yielded, so that the usual queries give the information of the
+        last ionic step:
+
+            for step in diagram.follow():
+                print(step, diagram.getNettoSpin())
+
+        The offset consumed so far is kept in self.offset, so following again
+        continues where it was left. If the file shrinks it is assumed to have
+        been overwritten and it is followed from the start.
+
+        :interval: Seconds to wait between checks for new data
+        :idle: Stop after these many seconds without new data, by default
+               follow forever
+
+        """
+        self._checkOutcar("Following")
+        if self._scanner is None:
+            self._scanner = outcar.BlockScanner(self.spin)
+        with open(self.filePath, "rb") as fd:
+            waited = 0
+            while True:
+                if os.fstat(fd.fileno()).st_size < self.offset:
+                    self.vprint("File %s was truncated, starting again"%self.filePath)
+                    self._scanner = outcar.BlockScanner(self.spin)
+                    self.offset   = 0
+                    self.steps    = 0
+                fd.seek(self.offset)
+                data = fd.read(outcar.BLOCK_SIZE)
+                if data:
+                    waited = 0
+                    self.offset += len(data)
+                    for block in self._scanner.feed(data):
+                        self._setConfiguration(self._parseBuffer(block))
+                        self.steps += 1
+                        yield self.steps
+                elif idle is not None and waited >= idle:
+                    return
+                else:
+                    time.sleep(interval)
+                    waited += interval
+
+    def getIndex(self):
+        """
+        Get the index of all the eigenvalue tables of the file, it is built
+        scanning the file only once the first time it is needed.
+        """
+        if self._index is None:
+            self._checkOutcar("Indexing")
+            if outcar.getCompression(self.filePath) is not None:
+                raise Exception(
+                    "The tables of the compressed file %s can not be indexed, "
+                    "use getTrajectory or decompress it"%self.filePath
+                )
+            self.vprint("Indexing the eigenvalue tables of %s", args=(self.filePath,))
+            with self._phase("index") as record:
+                self._index = outcar.OutcarIndex(self.filePath)
+                record.bytes += os.path.getsize(self.filePath)
+        return self._index
+
+    def getBlock(self, step=-1, spin=None, kpoint=1):
+        """
+        Get the states of the eigenvalue table of a given ionic step, spin and
+        k-point, negative steps are counted from the last one.
+
+        :step: Ionic step, starting from 0
+        :spin: Spin component 1 or 2, by default 1 or 0 if unpolarised
+        :kpoint: K-point, starting from 1
+        :returns: A list of states
+
+        """
+        if spin is None:
+            spin = 1 if self.spin else 0
+        table = self.getIndex().getTable(step, int(spin), kpoint)
+        states = self._tablesToStates([kpoint], [outcar.tokenizeTable(table)])
+        return self._addKeyToStates(states, "spin", spin)
+
+    def getStepConfiguration(self, step=-1):
+        """
+        Get the configuration of a given ionic step in the same form as
+        getConfiguration.
+        """
+        kpoints = self.getIndex().getKpoints()
+        if self.spin:
+            return dict(
+                (spin, np.stack([self.getBlock(step, spin, k) for k in kpoints]))
+                for spin in ["1", "2"]
+            )
+        else:
+            return np.stack([self.getBlock(step, 0, k) for k in kpoints])
+
+    def getTrajectory(self, workers=None, rangeSize=None):
+        """
+        Get the configuration of every ionic step of the file, all of them
+        read in a single streaming pass over the file, decompressed on the fly
+        if it is compressed.
+
+        With more than one worker the file is split in byte ranges scanned
+        by a pool of processes, every block is parsed by the worker of the
+        range where it starts and the blocks are merged in the order of the
+        file. Compressed files are always read by a single pass.
+
+        :workers: Number of processes, by default self.workers
+        :rangeSize: Size in bytes of the ranges, by default the file is split
+                    in RANGES_PER_WORKER ranges per worker of at least
+                    outcar.BLOCK_SIZE bytes
+        :returns: Array of states of shape (step, spin, kpoint, band)
+        """
+        if self._trajectory is None:
+            self._checkOutcar("Reading the trajectory")
+            self.vprint("Reading the trajectory of %s", args=(self.filePath,))
+            workers = workers or self.workers
+            with self._phase("scan") as record:
+                if workers > 1 and outcar.getCompression(self.filePath) is None:
+                    steps = self._scanParallel(workers, rangeSize)
+                    record.bytes += os.path.getsize(self.filePath)
+                else:
+                    scanner = outcar.BlockScanner(self.spin)
+                    steps   = []
+                    with outcar.openFile(self.filePath) as fd:
+                        for data in iter(lambda: fd.read(outcar.BLOCK_SIZE), b""):
+                            record.bytes += len(data)
+                            for block in scanner.feed(data):
+                                steps.append(self._stackSpins(self._parseBuffer(block)))
+            if steps:
+                self._trajectory = np.stack(steps)
+            else:
+                self._trajectory = np.zeros(
+                    (0, 2 if self.spin else 1, 0, 0), dtype=STATE_DTYPE
+                )
+        return self._trajectory
+
+    def _scanParallel(self, workers, rangeSize=None):
+        """
+        Parse the blocks of the file with a pool of processes, see
+        getTrajectory
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        size = os.path.getsize(self.filePath)
+        if rangeSize is None:
+            rangeSize = max(
+                -(-size//(RANGES_PER_WORKER*workers)), outcar.BLOCK_SIZE
+            )
+        starts = list(range(0, size, rangeSize))
+        ends   = [min(start + rangeSize, size) for start in starts]
+        self.vprint("Scanning %s ranges with %s workers", args=(len(starts), workers))
+        with ProcessPoolExecutor(min(workers, len(starts)) or 1) as pool:
+            ranges = pool.map(
+                _scanRange, [self.filePath]*len(starts),
+                [self.spin]*len(starts), starts, ends
+            )
+            return [step for steps in ranges for step in steps]
+
+    def getHomoTrajectory(self):
+        """
+        :returns: Energy of the highest occupied state at every ionic step
+        """
+        trajectory = self.getTrajectory()
+        occupied   = trajectory["occupation"] != 0
+        return np.where(occupied, trajectory["energy"], -np.inf).max(axis=(1, 2, 3))
+
+    def getLumoTrajectory(self):
+        """
+        :returns: Energy of the lowest unoccupied state at every ionic step
+        """
+        trajectory = self.getTrajectory()
+        occupied   = trajectory["occupation"] != 0
+        return np.where(occupied, np.inf, trajectory["energy"]).min(axis=(1, 2, 3))
+
+    def getBandGapTrajectory(self):
+        """
+        :returns: Band gap at every ionic step
+        """
+        return self.getLumoTrajectory() - self.getHomoTrajectory()
+
+    def getNettoSpinTrajectory(self):
+        """
+        :returns: Netto spin at every ionic step, as in getNettoSpin
+        """
+        if not self.spin:
+            raise Exception("To get the spin a polarised calcultion must be performed")
+        trajectory = self.getTrajectory()
+        nkpoints   = trajectory.shape[2]
+        occupation = trajectory["occupation"].sum(axis=(2, 3))/nkpoints
+        return abs(occupation[:, 0] - occupation[:, 1])/2
+
+    def printTrajectory(self):
+        """
+        Print the HOMO, LUMO, band gap and, if polarised, netto spin of every
+        ionic step
+        """
+        columns = [
+            self.getHomoTrajectory(),
+            self.getLumoTrajectory(),
+            self.getBandGapTrajectory()
+        ]
+        header = "step VB LB BG"
+        if self.spin:
+            columns.append(self.getNettoSpinTrajectory())
+            header += " SPIN"
+        print(header)
+        for step, row in enumerate(zip(*columns)):
+            print(" ".join(["%s"%step] + ["%.4f"%value for value in row]))
+
+    def _formatState(self, state):
+        """
+        Format a state record as a readable dictionary
+        """
+        return str(dict(zip(STATE_DTYPE.names, state.tolist())))
+
+    def export(self, filePath, trajectory=False):
+        """
+        Write the configuration to a columnar file, see smye.export
+
+        :filePath: Path of the file, .npz, .parquet or .arrow
+        :trajectory: Export every ionic step instead of only the last one
+        """
+        from smye import export
+        self.vprint("Exporting the configuration to %s"%filePath)
+        export.export([self], filePath, trajectory)
+
     def mosAsymptote(self, states, *args, **kwargs):
-        import mos
-        print(mos.MOS_ASYMPTOTE(states, *args, **kwargs))
+        from smye import mos
+        mos.writeAsymptote(sys.stdout, states, *args, **kwargs)
 
 
     def showASCII(self):
         """
-        Produces a crude ASCII representation of the electronic occupation
+        Produces a crude ASCII representation of the electronic occupation,
+        one after the other for every k-point
         """
+        states = self._getStates()
+        for k in range(states.shape[1]):
+            if states.shape[1] > 1:
+                print("k-point %s"%states[0, k, 0]["kpoint"])
+            self._showKpointASCII(states[:, k])
+
+    def _showKpointASCII(self, states):
         if self.spin:
-            states_spin1 = self.getConfiguration()["1"]
-            states_spin2 = self.getConfiguration()["2"]
+            states_spin1 = states[0]
+            states_spin2 = states[1]
             nelectrons = min(len(states_spin1), len(states_spin2))
             for i in range(nelectrons-1,-1,-1):
                 niveau1 = states_spin1[i]
                 niveau2 = states_spin2[i]
-                if niveau1["number"]==niveau2["number"]==str(i):
-                    occupation1 = 0.5
-                    occupation1 = abs(float(niveau1["occupation"]))
-                    occupation2 = abs(float(niveau2["occupation"]))
+                if niveau1["number"]==niveau2["number"]:
+                    occupation1 = abs(niveau1["occupation"])
+                    occupation2 = abs(niveau2["occupation"])
                     occupiedSymbol=""
                     if occupation1 or occupation2:
                         occupiedSymbol="+"
@@ -366,14 +1002,14 @@ class Diagram(object):
                     if not occupation2:
                         occupation2 = " "
                     if draw:
-                        print("%s.\t(%s) [%s][%s] (%s) %s"%(i, niveau2["energy"], occupation1, occupation2, niveau1["energy"], occupiedSymbol ))
+                        print("%s.\t(%.4f) [%s][%s] (%.4f) %s"%(niveau1["number"], niveau2["energy"], occupation1, occupation2, niveau1["energy"], occupiedSymbol ))
         else:
-            nelectrons = len(self.getConfiguration())
+            nelectrons = len(states[0])
             for i in range(nelectrons-1,0,-1):
-                niveau = self.getConfiguration()[i-1]
+                niveau = states[0][i-1]
                 # if niveau["number"]==niveau2["number"]==str(i):
                 # occupation = 0.5
-                occupation = abs(float(niveau["occupation"]))
+                occupation = abs(niveau["occupation"])
                 occupiedSymbol=""
                 if occupation:
                     occupiedSymbol="+"
@@ -383,5 +1019,19 @@ class Diagram(object):
                 if not occupation:
                     occupation = " "
                 if draw:
-                    print("%s.\t(%s) [%s] %s"%(i, niveau["energy"], occupation, occupiedSymbol ))
+                    print("%s.\t(%.4f) [%s] %s"%(i, niveau["energy"], occupation, occupiedSymbol ))
+
 
+def _scanRange(filePath, spin, start, end):
+    """
+    Parse the blocks starting in the byte range [start, end) of a file, run
+    in the worker processes of Diagram.getTrajectory
+
+    :returns: List with the states of every block as in Diagram.getTrajectory
+    """
+    diagram = Diagram(filePath, spin=spin)
+    with open(filePath, "rb") as fd:
+        return [
+            diagram._stackSpins(diagram._parseBuffer(block))
+            for offset, block in outcar.scanRange(fd, start, end, spin)
+        ]
@@ -0,0 +1,65 @@
+import io
+import os
+import sys
+import subprocess
+
+from smye import batch
+
+import unittest
+
+
+class TestBatch(unittest.TestCase):
+    def test_run(self):
+        out, err = io.StringIO(), io.StringIO()
+        failures = batch.run(
+            ["OUTCAR", "data/OUTCAR.C", "does/not/exist"],
+            workers=2, gap=True, getSpin=True, excited=[1, -1],
+            out=out, err=err
+        )
+        self.assertEqual(failures, 1)
+        self.assertEqual(out.getvalue().splitlines(), [
+            "file VB LB BG SPIN n=1 n=-1",
+            "OUTCAR 14.4759 15.7093 1.2334 1.00000 14.4759 15.7093",
+            "data/OUTCAR.C 15.6083 13.9573 -1.6510 1.00000 15.6083 13.9573",
+        ])
+        self.assertTrue(err.getvalue().startswith("ERROR does/not/exist"))
+    def test_pattern(self):
+        # a quoted pattern is expanded by the program, in batch mode even if
+        # it matches a single file
+        environment = dict(os.environ, PYTHONPATH=os.getcwd())
+        output = subprocess.check_output(
+            [sys.executable, "bin/smye", "data/OUTCAR.?", "-g"], env=environment
+        )
+        self.assertEqual(output.decode().splitlines(), [
+            "file VB LB BG",
+            "data/OUTCAR.C 15.6083 13.9573 -1.6510",
+        ])
+    def test_single_file_options(self):
+        environment = dict(os.environ, PYTHONPATH=os.getcwd())
+        process = subprocess.run(
+            [sys.executable, "bin/smye", "OUTCAR", "data/OUTCAR.C", "--trajectory"],
+            env=environment, capture_output=True
+        )
+        self.assertEqual(process.returncode, 2)
+        self.assertIn(b"--trajectory can not be used", process.stderr)
+        process = subprocess.run(
+            [sys.executable, "bin/smye", "OUTCAR", "data/OUTCAR.C", "-g",
+             "--export", "x.npz"],
+            env=environment, capture_output=True
+        )
+        self.assertEqual(process.returncode, 2)
+        self.assertIn(b"--export, -g/-n/--get-spin can not be combined", process.stderr)
+    def test_excited(self):
+        environment = dict(os.environ, PYTHONPATH=os.getcwd())
+        for files in [["OUTCAR"], ["OUTCAR", "data/OUTCAR.C"]]:
+            process = subprocess.run(
+                [sys.executable, "bin/smye"] + files + ["-n", "1", "0"],
+                env=environment, capture_output=True
+            )
+            self.assertEqual(process.returncode, 2)
+            self.assertIn(b"-n/--excited needs nonzero integers", process.stderr)
+    def test_expand(self):
+        self.assertEqual(
+            batch.expandPaths(["data/OUTCAR*", "nothing"]),
+            ["data/OUTCAR", "data/OUTCAR.C", "data/OUTCAR_NOSPIN", "nothing"]
+        )
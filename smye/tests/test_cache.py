@@ -0,0 +1,47 @@
+import smye
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from smye import cache
+
+import unittest
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = cache.ParseCache(directory=self.directory)
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+    def test_roundtrip(self):
+        self.assertEqual(self.cache.load("OUTCAR"), None)
+        parsed = smye.Diagram(filePath="OUTCAR", cache=self.cache).getConfiguration()
+        cached = self.cache.load("OUTCAR")
+        for spin in ["1", "2"]:
+            np.testing.assert_array_equal(parsed[spin], cached[spin])
+        self.assertEqual(self.cache.load("OUTCAR", spin=False), None)
+    def test_modified(self):
+        filePath = os.path.join(self.directory, "OUTCAR")
+        shutil.copy("OUTCAR", filePath)
+        smye.Diagram(filePath=filePath, cache=self.cache).getConfiguration()
+        self.assertNotEqual(self.cache.load(filePath), None)
+        with open(filePath, "a") as f:
+            f.write("\n")
+        self.assertEqual(self.cache.load(filePath), None)
+    def test_evict(self):
+        self.cache.maxSize = 1
+        smye.Diagram(filePath="OUTCAR", cache=self.cache).getConfiguration()
+        self.assertEqual(os.listdir(self.directory), [])
+    def test_evict_concurrent(self):
+        # the entries being written by other processes are kept
+        temporaryPath = os.path.join(self.directory, "entry" + cache.TEMPORARY_SUFFIX)
+        open(temporaryPath, "wb").close()
+        self.cache.maxSize = 1
+        smye.Diagram(filePath="OUTCAR", cache=self.cache).getConfiguration()
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(temporaryPath)])
+        # an entry removed meanwhile is just missing
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.cache.evict()
+        self.assertEqual(self.cache.load("OUTCAR"), None)
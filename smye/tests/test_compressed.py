@@ -0,0 +1,54 @@
+import os
+import bz2
+import gzip
+import lzma
+import shutil
+import tempfile
+
+import numpy as np
+
+import smye
+
+from smye import outcar
+
+import unittest
+
+
+class TestCompressed(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    def compress(self, filePath, opener):
+        path = os.path.join(self.directory, os.path.basename(filePath))
+        with open(filePath, "rb") as source, opener(path, "wb") as target:
+            shutil.copyfileobj(source, target)
+        return path
+    def test_formats(self):
+        for filePath, spin in [("OUTCAR", True), ("data/OUTCAR_NOSPIN", False)]:
+            plain = smye.Diagram(filePath=filePath, spin=spin)
+            for opener in [gzip.open, bz2.open, lzma.open]:
+                path = self.compress(filePath, opener)
+                self.assertIs(outcar.getCompression(path), opener)
+                diagram = smye.Diagram(filePath=path, spin=spin)
+                self.assertTrue(
+                    np.array_equal(diagram._getStates(), plain._getStates())
+                )
+                self.assertEqual(diagram.getFermiEnergy(), plain.getFermiEnergy())
+                self.assertEqual(
+                    diagram.getTrajectory().shape, plain.getTrajectory().shape
+                )
+                self.assertRaises(Exception, diagram.getIndex)
+        self.assertIsNone(outcar.getCompression("OUTCAR"))
+    def test_small_reads(self):
+        # the markers are split between the pieces read from the stream
+        with open("data/OUTCAR_NOSPIN", "rb") as fd:
+            expected = outcar.readLastBlock(fd, False)
+            fd.seek(0)
+            self.assertEqual(outcar.streamLastBlock(fd, False, 7), expected)
+            fd.seek(0)
+            self.assertEqual(outcar.streamFermiEnergy(fd, 5), 14.2319)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import numpy as np
+
+import smye
+
+from smye import dos
+
+import unittest
+
+
+class TestDOS(unittest.TestCase):
+    def test_methods(self):
+        diagram = smye.Diagram(filePath="OUTCAR")
+        grid, binned = diagram.getDOS(sigma=0.1, points=4000)
+        direct = dos.getDOS(diagram._getStates(), grid, 0.1, method="direct")
+        self.assertEqual(binned.shape, (2, 4000))
+        np.testing.assert_allclose(binned, direct, atol=1e-3*direct.max())
+        # every level integrates to one state
+        np.testing.assert_allclose(binned.sum(axis=1)*(grid[1] - grid[0]), [384, 384], rtol=1e-6)
+    def test_weights(self):
+        diagram = smye.Diagram(filePath="data/OUTCAR_NOSPIN", spin=False)
+        states = diagram._getStates()
+        grid = dos.getGrid(states["energy"], 0.2, 2000)
+        total = dos.getDOS(states, grid, 0.2)
+        occupied = dos.getDOS(states, grid, 0.2, occupation=True)
+        self.assertAlmostEqual(total[0].sum()*(grid[1] - grid[0]), 2*states.size, 4)
+        self.assertAlmostEqual(
+            occupied[0].sum()*(grid[1] - grid[0]), states["occupation"].sum(), 4
+        )
+        self.assertRaises(
+            Exception, dos.getDOS, states, grid, kpointWeights=[1, 1]
+        )
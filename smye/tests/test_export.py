@@ -0,0 +1,70 @@
+import io
+import os
+import tempfile
+
+import numpy as np
+
+import smye
+
+from smye import export
+from smye import batch
+
+import unittest
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filePath = os.path.join(self.directory, "states.npz")
+    def tearDown(self):
+        if os.path.exists(self.filePath):
+            os.remove(self.filePath)
+        os.rmdir(self.directory)
+    def test_diagram(self):
+        diagram = smye.Diagram(filePath="OUTCAR")
+        diagram.export(self.filePath)
+        with np.load(self.filePath) as columns:
+            self.assertEqual(sorted(columns.files), sorted(export.COLUMNS + ("files",)))
+            states = diagram._getStates().ravel()
+            np.testing.assert_array_equal(columns["energy"], states["energy"])
+            np.testing.assert_array_equal(columns["band"], states["number"])
+            self.assertEqual(set(columns["step"]), {-1})
+            self.assertEqual(list(columns["files"]), ["OUTCAR"])
+            self.assertEqual(set(columns["file"]), {0})
+    def test_batch(self):
+        failures = batch.exportFiles(
+            ["does/not/exist", "data/OUTCAR_NOSPIN"], self.filePath,
+            workers=2, spin=False, trajectory=True, err=io.StringIO()
+        )
+        self.assertEqual(failures, 1)
+        trajectory = smye.Diagram("data/OUTCAR_NOSPIN", spin=False).getTrajectory()
+        with np.load(self.filePath) as columns:
+            self.assertEqual(len(columns["energy"]), trajectory.size)
+            np.testing.assert_array_equal(
+                np.unique(columns["step"]), np.arange(len(trajectory))
+            )
+            self.assertEqual(set(columns["spin"]), {0})
+            self.assertEqual(
+                list(columns["files"]), ["does/not/exist", "data/OUTCAR_NOSPIN"]
+            )
+            self.assertEqual(set(columns["file"]), {1})
+    def test_writes(self):
+        # the columns of every write are appended
+        diagram = smye.Diagram(filePath="OUTCAR")
+        writer = export.openWriter(self.filePath, ["a", "b"])
+        writer.write(export.getColumns(diagram, fileIndex=1))
+        writer.write(export.getColumns(diagram, fileIndex=0))
+        writer.close()
+        states = diagram._getStates().ravel()
+        with np.load(self.filePath) as columns:
+            np.testing.assert_array_equal(
+                columns["energy"], np.concatenate([states["energy"]]*2)
+            )
+            np.testing.assert_array_equal(
+                columns["files"][columns["file"]], ["b"]*len(states) + ["a"]*len(states)
+            )
+        export.openWriter(self.filePath, []).close()
+        with np.load(self.filePath) as columns:
+            self.assertEqual(len(columns["energy"]), 0)
+    def test_format(self):
+        self.assertRaises(Exception, export.openWriter, "states.txt")
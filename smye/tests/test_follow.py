@@ -0,0 +1,32 @@
+import smye
+import os
+import tempfile
+import numpy as np
+
+import unittest
+
+
+class TestFollow(unittest.TestCase):
+    def setUp(self):
+        fd, self.filePath = tempfile.mkstemp()
+        os.close(fd)
+        with open("data/OUTCAR.C", "rb") as f:
+            self.data = f.read()
+    def tearDown(self):
+        os.remove(self.filePath)
+    def test_growing_file(self):
+        diagram = smye.Diagram(filePath=self.filePath)
+        half = len(self.data)//2
+        with open(self.filePath, "wb") as f:
+            f.write(self.data[:half])
+        first = list(diagram.follow(idle=0))
+        with open(self.filePath, "ab") as f:
+            f.write(self.data[half:])
+        second = list(diagram.follow(idle=0))
+        self.assertEqual(first + second, list(range(1, 13)))
+        self.assertEqual(diagram.offset, len(self.data))
+        last = smye.Diagram(filePath="data/OUTCAR.C")
+        np.testing.assert_array_equal(
+            diagram.getConfiguration()["2"], last.getConfiguration()["2"]
+        )
+        self.assertEqual(diagram.getHomo(), last.getHomo())
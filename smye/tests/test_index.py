@@ -0,0 +1,27 @@
+import smye
+import numpy as np
+
+import unittest
+
+
+class TestIndex(unittest.TestCase):
+    def setUp(self):
+        self.diagram = smye.Diagram(filePath="data/OUTCAR.C")
+    def tearDown(self):
+        self.diagram.getIndex().close()
+    def test_index(self):
+        index = self.diagram.getIndex()
+        self.assertEqual(index.nsteps, 12)
+        self.assertEqual(index.getSpins(), [1, 2])
+        self.assertEqual(index.getKpoints(), [1])
+    def test_last_step(self):
+        last = self.diagram.getStepConfiguration(-1)
+        for spin in ["1", "2"]:
+            np.testing.assert_array_equal(
+                last[spin],
+                self.diagram.getConfiguration()[spin]
+            )
+    def test_block(self):
+        states = self.diagram.getBlock(0, spin="2")
+        self.assertEqual(len(states), 280)
+        self.assertEqual(states[0]["spin"], 2)
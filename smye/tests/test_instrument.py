@@ -0,0 +1,33 @@
+import os
+
+import smye
+
+from smye import instrument, outcar
+
+import unittest
+
+
+class TestInstrument(unittest.TestCase):
+    def test_phases(self):
+        calls = []
+        profiler = instrument.Profiler(
+            callback=lambda *measurement: calls.append(measurement)
+        )
+        diagram = smye.Diagram(filePath="OUTCAR", profiler=profiler)
+        diagram.getHomo()
+        diagram.getNthMostEnergeticState(2, occupied=True)
+        records = profiler.records
+        self.assertEqual(
+            list(records), ["query", "open", "locate", "tokenize", "sort"]
+        )
+        # the nested queries of getHomo are not counted again
+        self.assertEqual(records["query"].calls, 2)
+        # only the last block is read, not the whole file
+        self.assertEqual(records["open"].bytes, outcar.MAGIC_SIZE)
+        self.assertLess(records["locate"].bytes, os.path.getsize("OUTCAR")//4)
+        self.assertEqual(records["tokenize"].states, diagram._getStates().size)
+        self.assertEqual(len(calls), 7)
+        self.assertEqual(calls[-1][0], "query")
+    def test_no_profiler(self):
+        diagram = smye.Diagram(filePath="OUTCAR")
+        self.assertEqual(diagram.getHomo()["energy"], 14.4759)
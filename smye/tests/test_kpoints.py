@@ -0,0 +1,58 @@
+import smye
+import os
+import tempfile
+
+import unittest
+
+BANDS = [
+    [(-5.0, 1.0), (1.0, 1.0), (3.0, 0.0), (4.0, 0.0)],
+    [(-5.0, 1.0), (1.5, 1.0), (3.8, 0.0), (4.0, 0.0)],
+    [(-5.0, 1.0), (0.5, 1.0), (2.8, 0.0), (4.0, 0.0)],
+]
+
+
+def outcarBlock(shift=0.0):
+    text = " E-fermi :   2.0000     XC(G=0): -13.3210     alpha+bet :-20.4673\n\n\n"
+    for spin in [1, 2]:
+        text += " spin component %s\n\n"%spin
+        for k, bands in enumerate(BANDS):
+            text += " k-point   %s :       0.0000    0.0000    0.0000\n"%(k+1)
+            text += "  band No.  band energies     occupation \n"
+            for n, (energy, occupation) in enumerate(bands):
+                energy += shift + 0.1*(spin - 1)
+                text += "  %5d  %11.4f  %11.5f\n"%(n+1, energy, occupation)
+            text += "\n"
+    return text + "\n" + "-"*104 + "\n\n"
+
+
+class TestKpoints(unittest.TestCase):
+    def setUp(self):
+        fd, self.filePath = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as f:
+            f.write(outcarBlock(shift=-10) + outcarBlock())
+        self.diagram = smye.Diagram(filePath=self.filePath)
+    def tearDown(self):
+        os.remove(self.filePath)
+    def test_shape(self):
+        self.assertEqual(self.diagram.getEnergies().shape, (2, 3, 4))
+        self.assertEqual(self.diagram.getConfiguration()["2"][2, 1]["energy"], 0.6)
+    def test_gap(self):
+        homo, lumo = self.diagram.getKpointHomoLumo()
+        self.assertEqual(list(homo), [1.1, 1.6, 0.6])
+        self.assertEqual(list(lumo), [3.0, 3.8, 2.8])
+        self.assertAlmostEqual(self.diagram.getBandGap(), 1.2)
+        self.assertEqual(self.diagram.getHomo()["kpoint"], 2)
+        self.assertEqual(self.diagram.getLumo()["kpoint"], 3)
+    def test_step_configuration(self):
+        last = self.diagram.getStepConfiguration(-1)
+        self.assertEqual(last["1"].shape, (3, 4))
+        self.assertEqual(last["1"][1, 1]["energy"], 1.5)
+    def test_without_spin(self):
+        # both channels of every k-point are put together
+        configuration = smye.Diagram(filePath=self.filePath, spin=False).getConfiguration()
+        self.assertEqual(configuration.shape, (3, 8))
+        self.assertTrue((configuration["kpoint"] == [[1], [2], [3]]).all())
+        self.assertEqual(list(configuration[1]["energy"][[1, 5]]), [1.5, 1.6])
+    def test_full_read(self):
+        diagram = smye.Diagram(filePath=self.filePath, reverse=False)
+        self.assertEqual(diagram.getEnergies().tolist(), self.diagram.getEnergies().tolist())
@@ -0,0 +1,39 @@
+import io
+
+import smye
+
+from smye import mos
+from smye import batch
+
+import unittest
+
+
+class TestMos(unittest.TestCase):
+    def test_arrays(self):
+        states = smye.Diagram(filePath="OUTCAR").getStatesAboutFermiLevel(2, 1)
+        script = mos.MOS_ASYMPTOTE(states)
+        self.assertIn("real[] ENERGIES = {15.7093, 14.4759, 14.4759};", script)
+        self.assertIn("real[] SPINS = {2, 1, 1};", script)
+        self.assertIn("real[] BANDS = {256, 256, 255};", script)
+        self.assertEqual(script.count("state("), 1)
+    def test_band_edges(self):
+        states = [
+            {"energy": "9.5", "spin": 0, "occupation": "2.0", "number": "1"},
+            {"energy": "10.1", "spin": 0, "occupation": "0.0", "number": "2"},
+        ]
+        script = mos.MOS_ASYMPTOTE(states)
+        self.assertIn("real ENERGIE_VB_PRISTINE = 10.1;", script)
+        self.assertIn("real ENERGIE_LB_PRISTINE = 9.5;", script)
+    def test_figure(self):
+        out, err = io.StringIO(), io.StringIO()
+        failures = batch.writeFigure(
+            [smye.Diagram(filePath="OUTCAR"), "data/OUTCAR.C", "nothing"],
+            2, 2, workers=2, columns=1, out=out, err=err
+        )
+        figure = out.getvalue()
+        self.assertEqual(failures, 1)
+        self.assertTrue(err.getvalue().startswith("ERROR nothing"))
+        self.assertEqual(figure.count("struct state {"), 1)
+        self.assertEqual(figure.count("real[] ENERGIES"), 2)
+        self.assertIn('LUMO_TITLE = "data/OUTCAR.C";', figure)
+        self.assertIn("add(FIGURE, shift(0, -%s)*currentpicture);"%mos.PANEL_HEIGHT, figure)
@@ -0,0 +1,110 @@
+import os
+import gzip
+import shutil
+import tempfile
+
+import numpy as np
+
+import smye
+
+from smye import readers, instrument
+
+import unittest
+
+
+def writeEigenval(filePath, states):
+    nspins, nkpoints, nbands = states.shape
+    scale = 2 if nspins == 1 else 1
+    with open(filePath, "w") as fd:
+        fd.write("   64   64    1    %s\n  0.1E+02  0.2E-09  0.2E-09  0.2E-09  0.5E-15\n"%nspins)
+        fd.write("  1.0E-004\n  CAR\n system\n   512   %s   %s\n"%(nkpoints, nbands))
+        for k in range(nkpoints):
+            fd.write("\n  0.0000000E+00  0.0000000E+00  0.0000000E+00  %.7E\n"%(1.0/nkpoints))
+            for band in range(nbands):
+                level = states[:, k, band]
+                fd.write("%5d%s%s\n"%(
+                    band + 1,
+                    "".join("  %12.6f"%e for e in level["energy"]),
+                    "".join("  %9.6f"%(o/scale) for o in level["occupation"])
+                ))
+
+
+def writeVasprun(filePath, states, fermiEnergy):
+    nspins, nkpoints, nbands = states.shape
+    with open(filePath, "w") as fd:
+        fd.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n<modeling>\n <calculation>\n')
+        # the projected eigenvalues must not be taken
+        fd.write('  <projected><eigenvalues><array><set><set comment="spin 1">'
+                 '<set comment="kpoint 1"><r> 99.0 1.0 </r></set></set></set>'
+                 '</array></eigenvalues></projected>\n')
+        fd.write('  <eigenvalues>\n   <array>\n    <field>eigene</field>\n'
+                 '    <field>occ</field>\n    <set>\n')
+        for spin in range(nspins):
+            fd.write('     <set comment="spin %s">\n'%(spin + 1))
+            for k in range(nkpoints):
+                fd.write('      <set comment="kpoint %s">\n'%(k + 1))
+                for level in states[spin, k]:
+                    fd.write('       <r> %10.4f %10.6f </r>\n'%(
+                        level["energy"], level["occupation"]*nspins/2
+                    ))
+                fd.write('      </set>\n')
+            fd.write('     </set>\n')
+        fd.write('    </set>\n   </array>\n  </eigenvalues>\n  <dos>\n')
+        fd.write('   <i name="efermi">    %.8f </i>\n  </dos>\n'%fermiEnergy)
+        fd.write(' </calculation>\n</modeling>\n')
+
+
+class TestReaders(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    def test_formats(self):
+        for filePath, spin in [("OUTCAR", True), ("data/OUTCAR_NOSPIN", False)]:
+            outcar = smye.Diagram(filePath=filePath, spin=spin)
+            states = outcar._getStates()
+            eigenval = os.path.join(self.directory, "EIGENVAL")
+            vasprun = os.path.join(self.directory, "vasprun.xml")
+            writeEigenval(eigenval, states)
+            writeVasprun(vasprun, states, outcar.getFermiEnergy())
+            for path, name in [(eigenval, "EIGENVAL"), (vasprun, "vasprun.xml")]:
+                diagram = smye.Diagram(filePath=path, spin=spin)
+                self.assertEqual(diagram.getReader().name, name)
+                self.assertTrue(np.array_equal(diagram._getStates(), states))
+                self.assertRaises(Exception, diagram.getTrajectory)
+            self.assertEqual(
+                smye.Diagram(filePath=vasprun, spin=spin).getFermiEnergy(),
+                outcar.getFermiEnergy()
+            )
+            for path in [eigenval, vasprun]:
+                profiler = instrument.Profiler()
+                smye.Diagram(filePath=path, spin=spin, profiler=profiler).getConfiguration()
+                self.assertEqual(profiler.records["tokenize"].states, states.size)
+        # the last files written are unpolarised
+        self.assertRaises(
+            SystemExit, smye.Diagram(filePath=eigenval, spin=True).getConfiguration
+        )
+    def test_directory(self):
+        self.assertEqual(readers.resolvePath(self.directory), self.directory)
+        shutil.copy("OUTCAR", self.directory)
+        diagram = smye.Diagram(filePath="OUTCAR")
+        writeVasprun(
+            os.path.join(self.directory, "vasprun.xml"), diagram._getStates(), 0
+        )
+        self.assertEqual(
+            readers.resolvePath(self.directory),
+            os.path.join(self.directory, "vasprun.xml")
+        )
+        eigenval = os.path.join(self.directory, "EIGENVAL")
+        writeEigenval(eigenval, diagram._getStates())
+        with open(eigenval, "rb") as source, gzip.open(eigenval + ".gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(eigenval)
+        directory = smye.Diagram(filePath=self.directory)
+        self.assertEqual(directory.filePath, eigenval + ".gz")
+        self.assertEqual(directory.getReader().name, "EIGENVAL")
+        self.assertEqual(directory.getNettoSpin(), diagram.getNettoSpin())
+
+
+if __name__ == '__main__':
+    unittest.main()
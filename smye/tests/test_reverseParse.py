@@ -0,0 +1,37 @@
+import smye
+import io
+import numpy as np
+
+from smye import outcar
+
+import unittest
+
+
+class TestReverseParse(unittest.TestCase):
+    def test_spin(self):
+        full = smye.Diagram(filePath="OUTCAR", reverse=False)
+        reverse = smye.Diagram(filePath="OUTCAR")
+        for spin in ["1", "2"]:
+            np.testing.assert_array_equal(
+                full.getConfiguration()[spin],
+                reverse.getConfiguration()[spin]
+            )
+    def test_nospin(self):
+        full = smye.Diagram(filePath="data/OUTCAR_NOSPIN", spin=False, reverse=False)
+        reverse = smye.Diagram(filePath="data/OUTCAR_NOSPIN", spin=False)
+        np.testing.assert_array_equal(
+            full.getConfiguration(),
+            reverse.getConfiguration()
+        )
+    def test_blocks(self):
+        data = open("OUTCAR", "rb").read()
+        for blockSize in [7, 16, 4096]:
+            fd = io.BytesIO(data)
+            self.assertEqual(
+                outcar.rfind(fd, b"spin component 1", blockSize=blockSize),
+                data.rfind(b"spin component 1")
+            )
+            self.assertEqual(
+                outcar.find(fd, b"spin component 2", 1000, blockSize=blockSize),
+                data.find(b"spin component 2", 1000)
+            )
@@ -0,0 +1,53 @@
+import numpy as np
+
+import smye
+
+import unittest
+
+
+class TestSelection(unittest.TestCase):
+    def setUp(self):
+        self.diagram = smye.Diagram(filePath="OUTCAR")
+    def tearDown(self):
+        pass
+    def test_nth_most(self):
+        energies = sorted(
+            list(self.diagram.getOccupiedStates(spin="1")["energy"]) +
+            list(self.diagram.getOccupiedStates(spin="2")["energy"]),
+            reverse=True
+        )
+        for n in [1, 2, 10, 50]:
+            state = self.diagram.getNthMostEnergeticState(n, occupied=True)
+            self.assertEqual(state["energy"], energies[n-1])
+    def test_degenerate(self):
+        # among degenerate states the last one in the table comes first
+        first = self.diagram.getNthMostEnergeticState(1, occupied=True)
+        second = self.diagram.getNthMostEnergeticState(2, occupied=True)
+        self.assertEqual(first["energy"], second["energy"])
+        self.assertEqual((first["number"], second["number"]), (256, 255))
+    def test_about_fermi_level(self):
+        states = self.diagram.getStatesAboutFermiLevel(3, 2)
+        self.assertEqual(len(states), 5)
+        self.assertEqual(
+            list(states["energy"]),
+            [15.7093, 15.7093, 14.4759, 14.4759, 13.8134]
+        )
+    def test_shared_views(self):
+        occupied = self.diagram.getOccupiedStates(spin="2")
+        self.assertIs(self.diagram.getOccupiedStates(spin="2"), occupied)
+        self.assertFalse(occupied.flags.writeable)
+        configuration = self.diagram.getConfiguration()
+        self.assertTrue(
+            np.shares_memory(configuration["2"], self.diagram._getStates())
+        )
+    def test_window(self):
+        self.assertEqual(self.diagram.getFermiEnergy(), 14.6443)
+        states = self.diagram.getStatesInWindow(-0.3, 1.1, relative=True)
+        self.assertEqual(
+            list(states["energy"]), [14.4759, 14.4759, 15.7093, 15.7093]
+        )
+        for emin, emax in [(-10, 0), (13.8134, 14.4759), (100, 200)]:
+            states = self.diagram.getStatesInWindow(emin, emax, spin="2")
+            expected = self.diagram.getConfiguration()["2"]["energy"].ravel()
+            expected = expected[(expected >= emin) & (expected <= emax)]
+            self.assertEqual(list(states["energy"]), sorted(expected))
@@ -0,0 +1,95 @@
+import os
+import json
+import asyncio
+import tempfile
+
+from smye import server
+
+import unittest
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socketPath = os.path.join(self.directory, "smye.sock")
+    def tearDown(self):
+        if os.path.exists(self.socketPath):
+            os.remove(self.socketPath)
+        os.rmdir(self.directory)
+    def request(self, requests):
+        """
+        Send every raw HTTP request of requests from a client of its own and
+        get the status codes and the bodies of the responses
+        """
+        instance = server.Server(workers=1)
+        async def client(request):
+            reader, writer = await asyncio.open_unix_connection(self.socketPath)
+            writer.write(request)
+            writer.write_eof()
+            head, _, body = (await reader.read()).partition(b"\r\n\r\n")
+            writer.close()
+            return int(head.split()[1]), json.loads(body)
+        async def main():
+            listener = await instance.start(self.socketPath)
+            async with listener:
+                return await asyncio.gather(*[client(r) for r in requests])
+        try:
+            return asyncio.run(main())
+        finally:
+            instance.close()
+    def query(self, requests, cacheSize=server.CACHE_SIZE):
+        """
+        Send every list of requests of requests from a client of its own and
+        get the responses
+        """
+        instance = server.Server(cacheSize=cacheSize, workers=2)
+        async def client(lines):
+            reader, writer = await asyncio.open_unix_connection(self.socketPath)
+            for line in lines:
+                writer.write(json.dumps(line).encode("utf-8") + b"\n")
+            writer.write_eof()
+            responses = [json.loads(l) for l in (await reader.read()).splitlines()]
+            writer.close()
+            return responses
+        async def main():
+            listener = await instance.start(self.socketPath)
+            async with listener:
+                return await asyncio.gather(*[client(r) for r in requests])
+        try:
+            return asyncio.run(main()), instance
+        finally:
+            instance.close()
+    def test_concurrent(self):
+        responses, instance = self.query([
+            [{"file": "OUTCAR", "query": "getHomo"},
+             {"file": "OUTCAR", "query": "getNettoSpin"}],
+            [{"file": "data/OUTCAR.C", "query": "getLumo"},
+             {"file": "OUTCAR", "query": "getNthLeastEnergeticState",
+              "args": [1], "kwargs": {"occupied": False}}],
+        ], cacheSize=1)
+        self.assertEqual(responses[0][0]["result"]["energy"], 14.4759)
+        self.assertEqual(responses[0][1], {"result": 1.0})
+        self.assertEqual(responses[1][0]["result"]["energy"], 13.9573)
+        self.assertEqual(responses[1][1]["result"]["energy"], 15.7093)
+        self.assertEqual(len(instance._diagrams), 1)
+    def test_errors(self):
+        responses, instance = self.query([[
+            {"file": "does/not/exist", "query": "getHomo"},
+            {"file": "OUTCAR", "query": "getConfiguration"},
+            {"query": "getHomo"},
+            {"file": "OUTCAR", "query": "getNthMostEnergeticStateWith", "args": [1]},
+            {"file": "OUTCAR", "query": "getNthMostEnergeticStateWith",
+             "args": [1], "kwargs": {"spin": "2"}},
+        ]])
+        self.assertEqual([sorted(r) for r in responses[0]], [["error"]]*4 + [["result"]])
+    def test_http(self):
+        body = json.dumps({"file": "OUTCAR", "query": "getNettoSpin"}).encode("utf-8")
+        responses = self.request([
+            b"POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n"%len(body) + body,
+            b"POST / HTTP/1.1\r\nContent-Length: many\r\n\r\n" + body,
+            b"POST / HTTP/1.1\r\nContent-Length: -1\r\n\r\n" + body,
+            b"POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n"%(len(body) + 1) + body,
+        ])
+        self.assertEqual(responses[0], (200, {"result": 1.0}))
+        self.assertEqual([r[0] for r in responses[1:]], [400]*3)
+        self.assertEqual([sorted(r[1]) for r in responses[1:]], [["error"]]*3)
@@ -0,0 +1,16 @@
+import os
+import sys
+import subprocess
+
+import unittest
+
+
+class TestStartup(unittest.TestCase):
+    def test_lazy_numpy(self):
+        environment = dict(os.environ, PYTHONPATH=os.getcwd())
+        output = subprocess.check_output([
+            sys.executable, "-c",
+            "import sys, smye; print('numpy' in sys.modules); "
+            "smye.Diagram; print('numpy' in sys.modules)"
+        ], env=environment)
+        self.assertEqual(output.split(), [b"False", b"True"])
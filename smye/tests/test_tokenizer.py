@@ -0,0 +1,31 @@
+from smye import outcar
+
+import unittest
+
+TABLES = """
+ k-point   1 :       0.0000    0.0000    0.0000
+  band No.  band energies     occupation 
+      1      -9.0143      1.00000
+      2      -7.8336      1.00000
+
+ k-point   2 :       0.5000    0.0000    0.0000
+  band No.  band energies     occupation 
+      1      -8.0143      1.00000
+      2      -6.8336      0.00000
+
+ soft charge-density along one line, spin component           1
+"""
+
+
+class TestTokenizer(unittest.TestCase):
+    def test_tables(self):
+        for text in [TABLES, TABLES.encode()]:
+            kpoints, tables = outcar.tokenizeTables(text)
+            self.assertEqual(kpoints, [1, 2])
+            self.assertEqual(tables[1].tolist(), [[1, -8.0143, 1], [2, -6.8336, 0]])
+    def test_end_of_table(self):
+        body = "  1  -9.0143  1.00000\n  2  -7.8336  1.00000\n total 1 2 3\n  3 1 1\n"
+        self.assertEqual(
+            outcar.tokenizeTable(body).tolist(),
+            [[1, -9.0143, 1], [2, -7.8336, 1]]
+        )
@@ -0,0 +1,50 @@
+import io
+import smye
+import numpy as np
+
+from smye import outcar
+
+import unittest
+
+
+class TestTrajectory(unittest.TestCase):
+    def setUp(self):
+        self.diagram = smye.Diagram(filePath="data/OUTCAR.C")
+    def tearDown(self):
+        if self.diagram._index is not None:
+            self.diagram._index.close()
+    def test_shape(self):
+        self.assertEqual(self.diagram.getTrajectory().shape, (12, 2, 1, 280))
+    def test_steps(self):
+        trajectory = self.diagram.getTrajectory()
+        for step in [0, 5, 11]:
+            configuration = self.diagram.getStepConfiguration(step)
+            np.testing.assert_array_equal(trajectory[step, 1], configuration["2"])
+    def test_helpers(self):
+        gaps = self.diagram.getBandGapTrajectory()
+        self.assertEqual(len(gaps), 12)
+        self.assertAlmostEqual(
+            gaps[-1],
+            self.diagram.getLumo()["energy"] - self.diagram.getHomo()["energy"]
+        )
+        self.assertAlmostEqual(
+            self.diagram.getNettoSpinTrajectory()[-1], self.diagram.getNettoSpin()
+        )
+    def test_parallel(self):
+        trajectory = self.diagram.getTrajectory()
+        for rangeSize in [4096, 300000]:
+            diagram = smye.Diagram(filePath="data/OUTCAR.C", workers=3)
+            np.testing.assert_array_equal(
+                diagram.getTrajectory(rangeSize=rangeSize), trajectory
+            )
+    def test_ranges(self):
+        # the blocks straddling the ends of the ranges are not lost
+        data = open("data/OUTCAR_NOSPIN", "rb").read()
+        blocks = outcar.BlockScanner(False).scan(data)
+        for rangeSize in [13, 7777]:
+            ranges = []
+            for start in range(0, len(data), rangeSize):
+                ranges += outcar.scanRange(
+                    io.BytesIO(data), start, start + rangeSize, False, 4096
+                )
+            self.assertEqual(ranges, blocks)
@@ -0,0 +1,51 @@
+import numpy as np
+
+import smye
+
+import unittest
+
+
+class TestTransitions(unittest.TestCase):
+    def setUp(self):
+        self.diagram = smye.Diagram(filePath="OUTCAR")
+    def getEnergies(self, channels):
+        # all the differences, as the matrix the engine does not build
+        states = self.diagram._getStates()
+        energies = []
+        for initial, final in channels:
+            occupied = states[initial][states[initial]["occupation"] != 0]
+            unoccupied = states[final][states[final]["occupation"] == 0]
+            energies.append(
+                (unoccupied["energy"][np.newaxis] - occupied["energy"][:, np.newaxis]).ravel()
+            )
+        return np.sort(np.concatenate(energies))
+    def test_window(self):
+        energies = self.getEnergies([(0, 0), (1, 1)])
+        transitions = self.diagram.getTransitions(emin=1.5, emax=3)
+        np.testing.assert_array_equal(
+            transitions["energy"], energies[(energies >= 1.5) & (energies <= 3)]
+        )
+        np.testing.assert_array_equal(
+            transitions["energy"],
+            transitions["final"]["energy"] - transitions["initial"]["energy"]
+        )
+        self.assertTrue(
+            (transitions["initial"]["spin"] == transitions["final"]["spin"]).all()
+        )
+    def test_top(self):
+        energies = self.getEnergies([(0, 1), (1, 0)])
+        for top in [1, 3, 50, 10**6]:
+            transitions = self.diagram.getTransitions(top=top, kind="flip")
+            np.testing.assert_array_equal(transitions["energy"], energies[:top])
+        transitions = self.diagram.getTransitions(top=4, kind="all")
+        np.testing.assert_allclose(transitions["energy"], [1.2334]*4)
+        self.assertEqual(list(transitions["final"]["spin"]), [2]*4)
+    def test_errors(self):
+        self.assertRaises(Exception, self.diagram.getTransitions, kind="up")
+        diagram = smye.Diagram(filePath="data/OUTCAR_NOSPIN", spin=False)
+        self.assertRaises(Exception, diagram.getTransitions, kind="flip")
+        self.assertEqual(len(diagram.getTransitions(top=0)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Enumeration of the transitions from occupied to unoccupied states.
+
+The energies of the unoccupied states are sorted, so that the transitions of
+every occupied state with energies in a window [emin, emax] are a run of
+unoccupied states, bounded with searchsorted. Only the transitions inside
+the window are built, never the whole matrix of differences. The lowest top
+transitions are found by bisecting the upper end of the window on the number
+of transitions below it, which is counted from the bounds alone.
+"""
+
+import numpy as np
+
+from smye.smye import STATE_DTYPE
+
+#: Record of a transition, its energy is the one of the final state minus the
+#: one of the initial state
+TRANSITION_DTYPE = np.dtype([
+    ("energy", np.float64),
+    ("initial", STATE_DTYPE),
+    ("final", STATE_DTYPE)
+])
+
+#: Kinds of transitions by the spins of their initial and final states
+KINDS = ("conserving", "flip", "all")
+
+
+def _sortGroups(groups):
+    sortedGroups = []
+    for initial, final in groups:
+        initial = initial[np.argsort(initial["energy"], kind="stable")]
+        final   = final[np.argsort(final["energy"], kind="stable")]
+        sortedGroups.append((initial, final, np.ascontiguousarray(final["energy"])))
+    return sortedGroups
+
+
+def _getBounds(initial, energies, emin, emax):
+    """
+    Get the range [lower, upper) of the final states of every initial state
+    in the window
+    """
+    if emin is None:
+        lower = np.zeros(len(initial), dtype=np.intp)
+    else:
+        lower = np.searchsorted(energies, initial["energy"] + emin, "left")
+    if emax is None:
+        upper = np.full(len(initial), len(energies), dtype=np.intp)
+    else:
+        upper = np.searchsorted(energies, initial["energy"] + emax, "right")
+    return lower, np.maximum(upper, lower)
+
+
+def _count(groups, emin, emax):
+    count = 0
+    for initial, final, energies in groups:
+        lower, upper = _getBounds(initial, energies, emin, emax)
+        count += int((upper - lower).sum())
+    return count
+
+
+def _getWindow(groups, emin, emax):
+    """
+    Build the transitions of the groups in the window
+    """
+    transitions = []
+    for initial, final, energies in groups:
+        lower, upper = _getBounds(initial, energies, emin, emax)
+        counts = upper - lower
+        # indices of the initial and final state of every transition
+        i = np.repeat(np.arange(len(initial)), counts)
+        j = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - lower, counts)
+        group = np.zeros(len(i), dtype=TRANSITION_DTYPE)
+        group["initial"] = initial[i]
+        group["final"]   = final[j]
+        group["energy"]  = group["final"]["energy"] - group["initial"]["energy"]
+        transitions.append(group)
+    if not transitions:
+        return np.zeros(0, dtype=TRANSITION_DTYPE)
+    return np.concatenate(transitions)
+
+
+def _getThreshold(groups, emin, emax, top):
+    """
+    Get the smallest upper end of the window with at least top transitions
+    below it, or emax if there are not as many
+    """
+    groups = [g for g in groups if len(g[0]) and len(g[1])]
+    if not groups:
+        return emax
+    low  = min(g[2][0] - g[0]["energy"].max() for g in groups)
+    high = max(g[2][-1] - g[0]["energy"].min() for g in groups)
+    if emax is not None:
+        high = min(high, emax)
+    if _count(groups, emin, high) <= top:
+        return emax
+    # there are less than top transitions below low, and at least top below
+    # high, which converge to the energy of the top-th transition
+    low -= 1.0
+    while True:
+        middle = 0.5*(low + high)
+        if middle <= low or middle >= high:
+            return high
+        if _count(groups, emin, middle) >= top:
+            high = middle
+        else:
+            low = middle
+
+
+def getTransitions(groups, emin=None, emax=None, top=None):
+    """
+    Get the transitions from the initial to the final states of every group
+    with energies in a window.
+
+    :groups: List of tuples (initial, final) of arrays of STATE_DTYPE states,
+             e.g. the occupied and unoccupied states of a spin channel
+    :emin: Lowest energy of the transitions, by default no bound
+    :emax: Highest energy of the transitions, by default no bound
+    :top: Get only the top transitions of lowest energy
+    :returns: Array of TRANSITION_DTYPE sorted by increasing energy
+
+    """
+    groups = _sortGroups(groups)
+    if top is not None:
+        if top <= 0:
+            return np.zeros(0, dtype=TRANSITION_DTYPE)
+        emax = _getThreshold(groups, emin, emax, top)
+    transitions = _getWindow(groups, emin, emax)
+    transitions = transitions[np.argsort(transitions["energy"], kind="stable")]
+    return transitions if top is None else transitions[:top]